@@ -0,0 +1,73 @@
+"""
+Browser fetch throughput: a fresh Chromium per batch (the old
+`fetch_browser_batch`) against the long-lived BrowserPagePool, both loading
+pages from the local stub server of bench_http_pool.
+
+    python -m benchmarks.bench_browser_pool --pages 60 --pool-size 3
+"""
+import argparse
+import asyncio
+import time
+
+from playwright.async_api import async_playwright
+
+from benchmarks.bench_http_pool import StubServer
+from services.browser_pool import BrowserPagePool, process_tree_rss
+
+
+async def launch_per_batch(urls: list[str], batch_size: int) -> float:
+    started = time.perf_counter()
+    for i in range(0, len(urls), batch_size):
+        async with async_playwright() as playwright:
+            browser = await playwright.chromium.launch()
+            context = await browser.new_context()
+            pages = [await context.new_page() for _ in urls[i:i + batch_size]]
+            await asyncio.gather(*(page.goto(url) for page, url in zip(pages, urls[i:i + batch_size])))
+            await browser.close()
+    return len(urls) / (time.perf_counter() - started)
+
+
+async def pooled(urls: list[str], size: int) -> tuple[float, dict]:
+    pool = BrowserPagePool(size=size)
+    await pool.start()
+
+    async def fetch(url):
+        async with pool.page() as page:
+            await page.goto(url)
+            return await page.content()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(fetch(url) for url in urls))
+    rate = len(urls) / (time.perf_counter() - started)
+    metrics = pool.metrics()
+    await pool.close()
+    return rate, metrics
+
+
+async def run(args):
+    stub = StubServer(args.latency)
+    base_url = await stub.start()
+    urls = [f"{base_url}/sch/i.html?_pgn={page}" for page in range(args.pages)]
+
+    rate = await launch_per_batch(urls, args.pool_size)
+    print(f"launch per batch: {rate:6.2f} pages/sec")
+    rate, metrics = await pooled(urls, args.pool_size)
+    print(
+        f"page pool       : {rate:6.2f} pages/sec, launch {metrics['launch_seconds']}s once, "
+        f"RSS {metrics['rss_mb']} MB (browser {metrics['browser_rss_mb']} MB + {metrics['rss_mb_per_page']} MB per page)"
+    )
+    print(f"after close     : RSS {process_tree_rss() / 1024 / 1024:.1f} MB")
+    await stub.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--pool-size", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Measure the streaming export: throughput in MB/s and peak RSS.
+
+The export generator runs in-process against the configured Mongo, so the
+peak RSS is the server-side cost of one export. With `--seed N` a scratch
+collection is filled with N synthetic books first (and dropped afterwards).
+
+    python -m benchmarks.bench_export --seed 200000 --batch-size 1000
+    python -m benchmarks.bench_export --format csv --gzip
+"""
+import argparse
+import asyncio
+import random
+import resource
+import time
+from datetime import datetime
+
+from book.export import export_books
+from book.queries import DEFAULT_FIELDS
+from database import mongo_instance
+
+SCRATCH_COLLECTION = "bench_export_book"
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def seed(collection, total: int):
+    await collection.drop()
+    batch = []
+    for i in range(total):
+        batch.append({
+            "source_url": f"https://books.toscrape.com/catalogue/book_{i}/index.html",
+            "title": f"Book {i}",
+            "category": random.choice(["Poetry", "History", "Travel", "Fiction"]),
+            "price_incl_tax": round(random.uniform(10, 60), 2),
+            "price_excl_tax": round(random.uniform(10, 60), 2),
+            "availability": f"In stock ({random.randint(1, 22)} available)",
+            "num_reviews": 0,
+            "rating": random.choice(["One", "Two", "Three", "Four", "Five"]),
+            "image_url": f"https://books.toscrape.com/media/cache/{i:032x}.jpg",
+            "description": "lorem ipsum " * 80,
+            "created_at": datetime.now(),
+        })
+        if len(batch) == 5000:
+            await collection.insert_many(batch)
+            batch = []
+    if batch:
+        await collection.insert_many(batch)
+
+
+async def run(args):
+    await mongo_instance.connect()
+    collection = mongo_instance.db[SCRATCH_COLLECTION if args.seed else "book"]
+    try:
+        if args.seed:
+            await seed(collection, args.seed)
+        rss_before = peak_rss_mb()
+        fields = args.fields.split(",") if args.fields else DEFAULT_FIELDS
+
+        total_bytes, chunks = 0, 0
+        started = time.perf_counter()
+        async for chunk in export_books(collection, {}, fields, args.format, args.batch_size, args.gzip):
+            total_bytes += len(chunk)
+            chunks += 1
+        elapsed = time.perf_counter() - started
+
+        print(
+            f"{args.format}{' + gzip' if args.gzip else ''}, batch_size {args.batch_size}: "
+            f"{total_bytes / 1024 / 1024:.1f} MB in {elapsed:.2f}s "
+            f"({total_bytes / 1024 / 1024 / elapsed:.1f} MB/s, {chunks} chunks), "
+            f"peak RSS {peak_rss_mb():.0f} MB ({peak_rss_mb() - rss_before:+.0f} MB during export)"
+        )
+    finally:
+        if args.seed and not args.keep:
+            await collection.drop()
+        await mongo_instance.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", type=int, default=0, help="export N synthetic books from a scratch collection")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch collection")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--fields", help="comma separated fields, defaults to the listing fields")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+List-page throughput of the pooled async client against a local stub server.
+
+The stub speaks HTTP/1.1 keep-alive, answers every request after a fixed
+delay with a gzip-compressed results page, and counts the connections it
+accepted. With `--proxies N`, N stubs act as forward proxies (they answer
+the absolute-form request themselves) and pages are spread over them, one
+client pool per proxy, as EbayScraperEngine does. Throughput should grow
+with concurrency; the blocking baseline is one `requests.get` after another.
+
+    python -m benchmarks.bench_http_pool --pages 400 --latency 0.05 --concurrency 1 4 16 64 --proxies 4
+"""
+import argparse
+import asyncio
+import gzip
+import time
+
+from services.http_pool import ProxyClientPool
+
+PAGE = gzip.compress((
+    "<html><head><title>Sold items | eBay</title></head><body><ul class='srp-results srp-list clearfix'>"
+    + "<li class='s-card'>item</li>" * 60
+    + "</ul></body></html>"
+).encode("utf-8"))
+
+
+class StubServer:
+    def __init__(self, latency: float, body: bytes = PAGE):
+        self.latency = latency
+        self.body = body
+        self.connections = 0
+        self.server = None
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                request = await reader.readuntil(b"\r\n\r\n")
+                if not request:
+                    break
+                await asyncio.sleep(self.latency)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Encoding: gzip\r\n"
+                    + f"Content-Length: {len(self.body)}\r\nConnection: keep-alive\r\n\r\n".encode()
+                    + self.body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+async def crawl(base_url: str, proxies: list, pages: int, concurrency: int) -> tuple[float, dict]:
+    pool = ProxyClientPool(
+        concurrency=concurrency,
+        connections_per_proxy=-(-concurrency // max(1, len(proxies)))
+    )
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(
+        pool.get(f"{base_url}/sch/i.html?_pgn={page}", proxy=proxies[page % len(proxies)] if proxies else None)
+        for page in range(pages)
+    ))
+    elapsed = time.perf_counter() - started
+    assert all("srp-results" in response.text for response in responses)
+    metrics = pool.metrics()
+    await pool.close()
+    return pages / elapsed, metrics
+
+
+async def run(args):
+    stubs = [StubServer(args.latency) for _ in range(max(1, args.proxies))]
+    urls = [await stub.start() for stub in stubs]
+    base_url, proxies = ("http://ebay.test", urls) if args.proxies else (urls[0], [])
+    print(f"blocking baseline: {1 / args.latency:8.1f} pages/sec (one request at a time)")
+    for concurrency in args.concurrency:
+        for stub in stubs:
+            stub.connections = 0
+        rate, metrics = await crawl(base_url, proxies, args.pages, concurrency)
+        print(
+            f"concurrency {concurrency:>4}: {rate:8.1f} pages/sec, peak in flight {metrics['peak_in_flight']}, "
+            f"{sum(stub.connections for stub in stubs)} connections over {metrics['clients']} client pools"
+        )
+    for stub in stubs:
+        await stub.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub server delay per request in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--proxies", type=int, default=0, help="route through N local stub proxies")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Compare crawl throughput with inline parsing against the process-pool parser.
+
+Saved snapshots are served through an httpx mock transport that adds a fixed
+network delay, so the numbers show how much parsing holds back concurrent
+fetches without touching the live site or Mongo.
+
+    python -m benchmarks.bench_parser ./data/snapshots --pages 2000 --latency 0.05
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import time
+
+import httpx
+
+from crawler import CrawlerEngine
+from services.snapshot_archive import iter_snapshots
+
+
+def load_snapshots(snapshot_dir: str) -> list[str]:
+    pages = [html for _, html in iter_snapshots(snapshot_dir)]
+    if not pages:
+        raise SystemExit(f"No snapshots found in {snapshot_dir}, run the crawler once first")
+    return pages
+
+
+def make_transport(pages: list[str], latency: float) -> httpx.AsyncBaseTransport:
+    cycle = itertools.cycle(pages)
+
+    class DelayedTransport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            await asyncio.sleep(latency)
+            return httpx.Response(200, text=next(cycle), request=request)
+
+    return DelayedTransport()
+
+
+async def crawl(engine: CrawlerEngine, pages: list[str], total: int, latency: float) -> float:
+    engine.start_parser_pool()
+    sem = asyncio.Semaphore(engine.CONCURRENT_REQUESTS)
+
+    async with httpx.AsyncClient(transport=make_transport(pages, latency)) as client:
+        async def task(i):
+            async with sem:
+                html = await engine.fetch(client, f"{engine.BASE_URL}catalogue/book_{i}/index.html")
+                await engine.parse("parse_book", html)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(task(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+
+    engine.stop_parser_pool()
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("snapshot_dir", nargs="?", default="./data/snapshots")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated network latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=CrawlerEngine.CONCURRENT_REQUESTS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--extractor", default=CrawlerEngine.EXTRACTOR)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    pages = load_snapshots(args.snapshot_dir)
+    CrawlerEngine.CONCURRENT_REQUESTS = args.concurrency
+
+    for mode in ("inline", "process"):
+        engine = CrawlerEngine(extractor=args.extractor, parse_mode=mode, parser_workers=args.workers)
+        rate = asyncio.run(crawl(engine, pages, args.pages, args.latency))
+        print(f"{mode:>8}: {rate:8.1f} pages/sec ({args.extractor}, concurrency {args.concurrency})")
+
+
+if __name__ == "__main__":
+    main()
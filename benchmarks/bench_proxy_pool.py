@@ -0,0 +1,86 @@
+"""
+Throughput of the proxy pool as proxies are added, with local stand-in proxies.
+
+Each stand-in is a stub server of bench_http_pool acting as a forward
+proxy with a fixed delay. One extra stand-in always answers with eBay's
+block page, to show it being put in cooldown instead of slowing the run.
+Throughput should grow roughly linearly with the number of healthy proxies.
+
+    python -m benchmarks.bench_proxy_pool --pages 400 --proxies 1 2 4 8 --latency 0.05
+"""
+import argparse
+import asyncio
+import gzip
+import time
+
+from benchmarks.bench_http_pool import StubServer
+from services.http_pool import ProxyClientPool
+from services.proxy_pool import BLOCKED, ProxyPool
+from services.throttle import ERROR
+
+BLOCK_PAGE = gzip.compress(b"<html><head><title>Pardon our interruption...</title></head><body></body></html>")
+
+
+async def crawl(proxies: list[str], pages: int) -> tuple[float, dict]:
+    proxy_pool = ProxyPool(proxies)
+    concurrency = len(proxies) * proxy_pool.max_in_flight
+    http = ProxyClientPool(concurrency=concurrency, connections_per_proxy=proxy_pool.max_in_flight)
+    queue = asyncio.Queue()
+    for page in range(pages):
+        queue.put_nowait(f"http://ebay.test/sch/i.html?_pgn={page}")
+    done = 0
+
+    async def worker():
+        nonlocal done
+        while not queue.empty():
+            url = queue.get_nowait()
+            async with proxy_pool.lease() as lease:
+                if lease is None:
+                    await asyncio.sleep(0.01)
+                    queue.put_nowait(url)
+                    continue
+                try:
+                    response = await http.get(url, proxy=lease.proxy)
+                except Exception:
+                    lease.outcome = ERROR
+                    queue.put_nowait(url)
+                    continue
+                if "Pardon our interruption" in response.text:
+                    lease.outcome = BLOCKED
+                    queue.put_nowait(url)
+                else:
+                    done += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await http.close()
+    return done / elapsed, proxy_pool.state()
+
+
+async def run(args):
+    healthy = [StubServer(args.latency) for _ in range(max(args.proxies))]
+    blocking = StubServer(args.latency, body=BLOCK_PAGE)
+    urls = [await stub.start() for stub in healthy]
+    blocked_url = await blocking.start()
+
+    for count in args.proxies:
+        rate, state = await crawl(urls[:count] + [blocked_url], args.pages)
+        cooling = [proxy["proxy"] for proxy in state["pool"] if proxy["cooling_for"]]
+        print(f"{count:>3} healthy proxies + 1 blocking: {rate:8.1f} pages/sec, cooling down: {cooling}")
+
+    for stub in healthy + [blocking]:
+        await stub.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--proxies", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
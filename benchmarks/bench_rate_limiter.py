@@ -0,0 +1,67 @@
+"""
+Per-request overhead of the rate limiter under concurrent load.
+
+`--concurrency` coroutines hit the limiter for `--keys` API keys and the
+latency of every `hit()` is recorded. The memory backend runs standalone;
+`--backend mongo` goes through the configured Mongo (collection `rate_limit`).
+
+    python -m benchmarks.bench_rate_limiter --requests 100000 --concurrency 200 --keys 1000
+    python -m benchmarks.bench_rate_limiter --backend mongo --requests 5000
+"""
+import argparse
+import asyncio
+import time
+
+from services.rate_limiter import MemoryBackend, MongoBackend, RateLimiter
+
+
+async def run(args):
+    backend = MemoryBackend()
+    if args.backend == "mongo":
+        from database import mongo_instance
+        await mongo_instance.connect()
+        backend = MongoBackend(mongo_instance.db)
+    limiter = RateLimiter(limit=1000, window=60, burst=100, backend=backend)
+
+    latencies, allowed = [], 0
+    queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(f"key-{i % args.keys}")
+
+    async def worker():
+        nonlocal allowed
+        while not queue.empty():
+            key = queue.get_nowait()
+            started = time.perf_counter()
+            decision = await limiter.hit(key)
+            latencies.append(time.perf_counter() - started)
+            allowed += decision.allowed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1e6
+    print(
+        f"{args.backend}: {args.requests} hits over {args.keys} keys, concurrency {args.concurrency}: "
+        f"{args.requests / elapsed:,.0f} hits/sec, p50 {percentile(50):.1f} µs, p99 {percentile(99):.1f} µs, "
+        f"{allowed} allowed"
+    )
+    if args.backend == "mongo":
+        await mongo_instance.db["rate_limit"].delete_many({"_id": {"$regex": "^key-"}})
+        await mongo_instance.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["memory", "mongo"], default="memory")
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--keys", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
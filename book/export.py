@@ -0,0 +1,76 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator
+
+from book.queries import book_projection
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _ndjson_chunk(books: list[dict], fields: list[str]) -> str:
+    return "".join(json.dumps(book, default=_json_default, ensure_ascii=False) + "\n" for book in books)
+
+
+def _csv_chunk(books: list[dict], fields: list[str]) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=["id", *fields], extrasaction="ignore")
+    writer.writerows(books)
+    return buffer.getvalue()
+
+
+def _csv_header(fields: list[str]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(["id", *fields])
+    return buffer.getvalue()
+
+
+async def export_books(
+    collection,
+    query: dict,
+    fields: list[str],
+    export_format: str = "ndjson",
+    batch_size: int = 1000,
+    gzip: bool = False
+) -> AsyncIterator[bytes]:
+    """
+    Stream the matching books one cursor batch at a time.
+
+    Only a single batch is ever held in memory: documents are pulled from the
+    Motor cursor, encoded and yielded as one chunk per batch, optionally
+    through an incremental gzip compressor.
+    """
+    encode = _csv_chunk if export_format == "csv" else _ndjson_chunk
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+
+    def output(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    if export_format == "csv":
+        yield output(_csv_header(fields))
+
+    cursor = collection.find(query, book_projection(fields), batch_size=batch_size).sort("_id", 1)
+    batch = []
+    async for book in cursor:
+        batch.append(book)
+        if len(batch) >= batch_size:
+            chunk = output(encode(batch, fields))
+            batch = []
+            if chunk:
+                yield chunk
+    if batch:
+        yield output(encode(batch, fields))
+    if compressor:
+        yield compressor.flush()
@@ -0,0 +1,115 @@
+import json
+from typing import AsyncIterator
+
+from fastapi import HTTPException, Request, status
+from pydantic import TypeAdapter, ValidationError
+
+from book.models import BookSchema
+from services.book_writer import upsert_books
+from services.cache import bump_version
+
+CHUNK_SIZE = 500
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+books_adapter = TypeAdapter(list[BookSchema])
+book_adapter = TypeAdapter(BookSchema)
+
+
+class MalformedLine:
+    """An NDJSON line that is not valid JSON; reported as an invalid item instead of failing the request."""
+
+    def __init__(self, error: ValueError):
+        self.error = error
+
+    def errors(self) -> list:
+        return [{"type": "json_invalid", "loc": [], "msg": f"Invalid JSON: {self.error}"}]
+
+
+def decode_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return MalformedLine(e)
+
+
+async def iter_ndjson(request: Request) -> AsyncIterator:
+    """Decode an NDJSON body line by line as it arrives."""
+    pending = b""
+    async for data in request.stream():
+        pending += data
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield decode_line(line)
+    if pending.strip():
+        yield decode_line(pending)
+
+
+async def iter_json_array(request: Request) -> AsyncIterator:
+    items = json.loads(await request.body())
+    if not isinstance(items, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON array of books")
+    for item in items:
+        yield item
+
+
+def validate_chunk(items: list) -> tuple[list[BookSchema], dict[int, list]]:
+    """Validate a whole chunk in one call; when it fails, keep the errors per position and re-validate the other items."""
+    try:
+        return books_adapter.validate_python(items), {}
+    except ValidationError as e:
+        failed = {}
+        for error in e.errors(include_url=False, include_input=False):
+            failed.setdefault(error["loc"][0], []).append({**error, "loc": error["loc"][1:]})
+        books = [book_adapter.validate_python(item) for index, item in enumerate(items) if index not in failed]
+        return books, failed
+
+
+async def ingest_books(db, request: Request, chunk_size: int = CHUNK_SIZE) -> dict:
+    """
+    Validate and upsert books from a JSON array or NDJSON body, `chunk_size`
+    items per `bulk_write`, and report the outcome of every item.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    items = iter_ndjson(request) if content_type in NDJSON_TYPES else iter_json_array(request)
+
+    results = []
+    chunk, offset = [], 0
+
+    async def write_chunk(chunk: list, offset: int):
+        failed = {index: item.errors() for index, item in enumerate(chunk) if isinstance(item, MalformedLine)}
+        positions = [index for index in range(len(chunk)) if index not in failed]
+        books, invalid = validate_chunk([chunk[index] for index in positions])
+        failed.update((positions[index], errors) for index, errors in invalid.items())
+        errors = {}
+        outcomes = await upsert_books(db, books, errors) if books else {}
+        for index, item in enumerate(chunk):
+            source_url = item.get("source_url") if isinstance(item, dict) else None
+            if index in failed:
+                results.append({"index": offset + index, "source_url": source_url, "status": "invalid", "errors": failed[index]})
+            elif source_url in errors:
+                results.append({"index": offset + index, "source_url": source_url, "status": "error", "errors": [errors[source_url]]})
+            else:
+                results.append({"index": offset + index, "source_url": source_url, "status": outcomes[source_url]})
+
+    try:
+        async for item in items:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                await write_chunk(chunk, offset)
+                offset += len(chunk)
+                chunk = []
+        if chunk:
+            await write_chunk(chunk, offset)
+    except json.JSONDecodeError as e:
+        # Only a JSON array body is parsed in one piece, before anything was written
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON: {e}")
+    finally:
+        # Also when a later chunk fails, so cached pages never outlive books already written
+        if any(result["status"] in ("inserted", "updated") for result in results):
+            await bump_version(db)
+
+    summary = {outcome: 0 for outcome in ("inserted", "updated", "invalid", "error")}
+    for result in results:
+        summary[result["status"]] += 1
+    return {"summary": summary, "results": results}
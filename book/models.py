@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Any, List, Optional
 
 class BookSchema(BaseModel):
     title: str
@@ -17,11 +17,19 @@ class BookSchema(BaseModel):
     crawl_timestamp: datetime = Field(default_factory=datetime.utcnow)
     crawl_status: str = "success"
     content_hash: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
     created_at: datetime
 
+class FieldChange(BaseModel):
+    field: str
+    old_value: Any = None
+    new_value: Any = None
+
 class ChangeLog(BaseModel):
     book_id: str
-    details: BookSchema
+    source_url: str
+    changes: List[FieldChange]
     change_time: datetime = Field(default_factory=datetime.utcnow)
 
 
@@ -29,4 +37,9 @@ class UrlRecordSchema(BaseModel):
     url: str
     type: str
     status: bool
+    priority: int = 0
+    shard: Optional[int] = None
+    attempts: int = 0
+    lease_until: Optional[datetime] = None
+    leased_by: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
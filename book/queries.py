@@ -0,0 +1,71 @@
+import re
+from typing import Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Query, status
+
+# Returned when the client does not ask for specific fields
+DEFAULT_FIELDS = [
+    "title", "category", "price_incl_tax", "price_excl_tax", "availability",
+    "num_reviews", "rating", "image_url", "source_url", "created_at",
+]
+# Everything a client may ask for; crawl internals (raw_html_path, content_hash, etag, ...) stay private
+PUBLIC_FIELDS = DEFAULT_FIELDS + ["description", "crawl_timestamp"]
+
+
+def book_filters(
+    category: Optional[str] = None,
+    rating: Optional[str] = Query(None, description="One, Two, Three, Four or Five"),
+    min_price: Optional[float] = Query(None, ge=0, description="Minimum price_incl_tax"),
+    max_price: Optional[float] = Query(None, ge=0, description="Maximum price_incl_tax"),
+    availability: Optional[str] = Query(None, description="Prefix match, e.g. 'In stock'"),
+) -> dict:
+    query = {}
+    if category:
+        query["category"] = category
+    if rating:
+        query["rating"] = rating
+    if min_price is not None or max_price is not None:
+        query["price_incl_tax"] = {}
+        if min_price is not None:
+            query["price_incl_tax"]["$gte"] = min_price
+        if max_price is not None:
+            query["price_incl_tax"]["$lte"] = max_price
+    if availability:
+        # Anchored prefix regexes can still use the availability index
+        query["availability"] = {"$regex": f"^{re.escape(availability)}"}
+    return query
+
+
+def book_fields(
+    fields: Optional[str] = Query(None, description="Comma separated list of fields to return"),
+) -> list[str]:
+    if not fields:
+        return DEFAULT_FIELDS
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in PUBLIC_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields {unknown}, expected any of {PUBLIC_FIELDS}"
+        )
+    return requested
+
+
+def book_projection(fields: list[str]) -> dict:
+    """Project the requested fields and let Mongo render `_id` as a string `id`."""
+    return {"_id": 0, "id": {"$toString": "$_id"}, **{field: 1 for field in fields}}
+
+
+def parse_object_id(value: str, name: str = "id") -> ObjectId:
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid {name}")
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[ObjectId]:
+    if cursor is None:
+        return None
+    return parse_object_id(cursor, "cursor")
@@ -1,34 +1,157 @@
 # book/routers.py
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from database import get_database
 
 from book.models import (
     BookSchema,
     ChangeLog
 )
+from book.export import (
+    EXPORT_FORMATS,
+    export_books
+)
+from book.ingest import ingest_books
+from book.queries import (
+    book_fields,
+    book_filters,
+    book_projection,
+    parse_cursor,
+    parse_object_id
+)
+from services.book_writer import upsert_books
+from services.cache import bump_version, response_cache
+from services.rate_limiter import rate_limit
+from services.price_history import (
+    book_history,
+    category_stats
+)
+
+router = APIRouter(dependencies=[Depends(rate_limit)])
 
-router = APIRouter()
+# Mongo write error codes
+DUPLICATE_KEY = 11000
+DOCUMENT_VALIDATION_FAILURE = 121
 
 @router.get("/books")
-async def get_books(db=Depends(get_database)):
-    books_cursor = db["book"].find()
-    books = await books_cursor.to_list(length=100)
+async def get_books(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="`next_cursor` of the previous page"),
+    limit: int = Query(50, ge=1, le=500),
+    filters: dict = Depends(book_filters),
+    fields: list[str] = Depends(book_fields),
+    db=Depends(get_database)
+):
+    """
+    Keyset pagination on `_id`: each page resumes after the last id of the
+    previous one, so page 1,000 costs the same index seek as page 1.
+    Pages are served from the response cache until the next crawl writes books.
+    """
+    async def load():
+        query = dict(filters)
+        after = parse_cursor(cursor)
+        if after:
+            query["_id"] = {"$gt": after}
 
-    # Convert ObjectIds to strings
-    for book in books:
-        book["_id"] = str(book["_id"])
-    return books
+        books_cursor = db["book"].find(query, book_projection(fields)).sort("_id", 1).limit(limit + 1)
+        books = await books_cursor.to_list(length=limit + 1)
 
-@router.post("/books")
-async def create_book(book: dict, db=Depends(get_database)):
-    """
-    Insert a single book.
-    Example POST JSON body:
-    {
-        "title": "My Book",
-        "author": "Author Name",
-        "year": 2025
+        has_more = len(books) > limit
+        books = books[:limit]
+        return {
+            "items": books,
+            "next_cursor": books[-1]["id"] if has_more else None
+        }
+
+    # Returning a Response skips the headers set by dependencies (rate limit), so pass them on
+    return await response_cache.respond(request, db, load, headers=response.headers)
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss ratio and latency of the response cache, to size CACHE_MAX_ENTRIES and CACHE_TTL."""
+    return response_cache.metrics()
+
+# Declared before any `/books/{id}` route so "export" is never read as an id
+@router.get("/books/export")
+async def export_books_stream(
+    response: Response,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    batch_size: int = Query(1000, ge=1, le=10000, description="Documents per cursor batch and per chunk"),
+    gzip: bool = Query(False, description="Compress the stream (Content-Encoding: gzip)"),
+    filters: dict = Depends(book_filters),
+    fields: list[str] = Depends(book_fields),
+    db=Depends(get_database)
+):
+    """
+    Stream the whole (filtered) catalogue as NDJSON or CSV.
+    Memory stays at one cursor batch no matter how many books match.
+    """
+    headers = {**response.headers, "Content-Disposition": f'attachment; filename="books.{format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        export_books(db["book"], filters, fields, format, batch_size, gzip),
+        media_type=EXPORT_FORMATS[format],
+        headers=headers
+    )
+
+@router.get("/books/{book_id}/history")
+async def get_book_history(
+    book_id: str,
+    days: int = Query(90, ge=1, le=3650),
+    db=Depends(get_database)
+):
+    """Daily min/max/avg/last price and stock of one book, from the `price_daily` rollup."""
+    book = await db["book"].find_one({"_id": parse_object_id(book_id, "book id")}, {"source_url": 1, "title": 1})
+    if book is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
+    return {
+        "id": book_id,
+        "title": book["title"],
+        "source_url": book["source_url"],
+        "days": await book_history(db, book["source_url"], days)
     }
+
+@router.get("/categories/{name}/stats")
+async def get_category_stats(
+    name: str,
+    days: int = Query(90, ge=1, le=3650),
+    db=Depends(get_database)
+):
+    """Daily min/max/avg price and in-stock ratio of a category, from the `category_daily` rollup."""
+    return {"category": name, "days": await category_stats(db, name, days)}
+
+@router.post("/books/bulk")
+async def create_books_bulk(request: Request, db=Depends(get_database)):
+    """
+    Upsert many books keyed on `source_url`.
+    The body is a JSON array of books, or one book per line with
+    `Content-Type: application/x-ndjson`. Items are validated against
+    BookSchema and written 500 at a time; the response reports every item
+    as inserted, updated, invalid (with the validation errors) or error.
+    """
+    return await ingest_books(db, request)
+
+@router.post("/books")
+async def create_book(book: BookSchema, db=Depends(get_database)):
+    """
+    Insert or update a single book, keyed on `source_url`.
+    Prefer POST /books/bulk for more than a handful of books.
     """
-    result = await db["book"].insert_one(book)
-    return {"inserted_id": str(result.inserted_id)}
\ No newline at end of file
+    errors = {}
+    results = await upsert_books(db, [book], errors)
+    if results[book.source_url] == "error":
+        error = errors[book.source_url]
+        if error["code"] == DUPLICATE_KEY:
+            status_code = status.HTTP_409_CONFLICT
+        elif error["code"] == DOCUMENT_VALIDATION_FAILURE:
+            status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+        else:
+            status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        raise HTTPException(status_code=status_code, detail=jsonable_encoder(error))
+    await bump_version(db)
+    return {"source_url": book.source_url, "status": results[book.source_url]}
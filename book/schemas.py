@@ -11,7 +11,7 @@ def book_collection_schema():
                          "source_url", "content_hash", "created_at"],
             "properties": {
                 "title": {"bsonType": "string", "description": "Book title required"},
-                "description": {"bsonType": "string", "description": "Optional description"},
+                "description": {"bsonType": ["string", "null"], "description": "Optional description"},
                 "category": {"bsonType": "string", "description": "Book category required"},
                 "price_incl_tax": {"bsonType": "double", "minimum": 0, "description": "Price including tax"},
                 "price_excl_tax": {"bsonType": "double", "minimum": 0, "description": "Price excluding tax"},
@@ -22,8 +22,10 @@ def book_collection_schema():
                 "source_url": {"bsonType": "string", "description": "Source URL"},
                 "crawl_timestamp": {"bsonType": "date", "description": "Crawl timestamp"},
                 "crawl_status": {"bsonType": "string", "description": "Crawl status"},
-                "raw_html_path": {"bsonType": "string", "description": "Path to raw HTML file"},
+                "raw_html_path": {"bsonType": ["string", "null"], "description": "Snapshot of the raw HTML, none for books posted through the API"},
                 "content_hash": {"bsonType": "string", "description": "Unique content hash"},
+                "etag": {"bsonType": ["string", "null"], "description": "ETag of the last 200 response"},
+                "last_modified": {"bsonType": ["string", "null"], "description": "Last-Modified of the last 200 response"},
                 "created_at": {"bsonType": "date"}
             }
         }
@@ -34,22 +36,31 @@ def book_collection_schema():
 
 
 def change_log_schema():
-    book_schema = book_collection_schema()["$jsonSchema"]["properties"]
-    book_schema["_id"] = {
-        "bsonType": "object"
-    }
     validator = {
         "$jsonSchema": {
             "bsonType": "object",
-            "required": ["book_id", "details", "change_time"],
+            "required": ["book_id", "changes", "change_time"],
             "properties": {
                 "book_id": {
                     "bsonType": "string",
                     "description": "The ID of the book being changed"
                 },
-                "details": {
-                    "bsonType": "object",
-                    "properties": book_schema
+                "source_url": {
+                    "bsonType": "string"
+                },
+                "changes": {
+                    "bsonType": "array",
+                    "minItems": 1,
+                    "description": "Only the fields that changed",
+                    "items": {
+                        "bsonType": "object",
+                        "required": ["field", "old_value", "new_value"],
+                        "properties": {
+                            "field": {"bsonType": "string"},
+                            "old_value": {},
+                            "new_value": {}
+                        }
+                    }
                 },
                 "change_time": {
                     "bsonType": "date",
@@ -65,7 +76,7 @@ def url_record_schema():
     validator = {
         "$jsonSchema": {
             "bsonType": "object",
-            "required": ["url", "type", "status", "crawl_time"],
+            "required": ["url", "type", "status", "timestamp"],
             "properties": {
                 "url": {
                     "bsonType": "string"
@@ -76,9 +87,28 @@ def url_record_schema():
                 "status": {
                     "bsonType": "bool"
                 },
+                "priority": {
+                    "bsonType": "int"
+                },
+                "shard": {
+                    "bsonType": ["int", "null"],
+                    "description": "Detail bucket in distributed mode"
+                },
+                "attempts": {
+                    "bsonType": "int",
+                    "minimum": 0
+                },
+                "lease_until": {
+                    "bsonType": ["date", "null"],
+                    "description": "Lease expiry while a worker holds the url"
+                },
+                "leased_by": {
+                    "bsonType": ["string", "null"]
+                },
                 "timestamp": {
                     "bsonType": "date"
                 }
             }
         }
-    }
\ No newline at end of file
+    }
+    return validator
@@ -5,8 +5,20 @@ load_dotenv()
 
 class Settings:
     API_KEY = os.getenv("API_KEY", "supersecretkey123")
-    RATE_LIMIT = int(os.getenv("RATE_LIMIT", 100))
+    RATE_LIMIT = int(os.getenv("RATE_LIMIT", 100))  # requests per RATE_LIMIT_WINDOW and API key
+    RATE_LIMIT_WINDOW = float(os.getenv("RATE_LIMIT_WINDOW", 3600))
+    RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", 10))  # requests allowed back to back
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # "memory" (per process) or "mongo" (shared)
     MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
     MONGO_DB = os.getenv("MONGO_DB", "books_db")
+    SNAPSHOT_BACKEND = os.getenv("SNAPSHOT_BACKEND", "store")  # "store" (one file per hash) or "archive" (packed segments)
+    SNAPSHOT_ARCHIVE_DIR = os.getenv("SNAPSHOT_ARCHIVE_DIR", "./data/archive")
+    CHANGELOG_RETENTION_DAYS = int(os.getenv("CHANGELOG_RETENTION_DAYS", 365))  # 0 keeps changes forever
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # "memory" (per process) or "mongo" (shared)
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 1024))
+    CACHE_TTL = float(os.getenv("CACHE_TTL", 3600))
+    PARSE_MODE = os.getenv("PARSE_MODE", "inline")  # "inline" or "process"
+    PARSER_WORKERS = int(os.getenv("PARSER_WORKERS", os.cpu_count() or 1))
+    PARSER_QUEUE_DEPTH = int(os.getenv("PARSER_QUEUE_DEPTH", 0)) or 2 * PARSER_WORKERS
 
 settings = Settings()
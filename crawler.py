@@ -1,24 +1,38 @@
 import asyncio
 import httpx
-from bs4 import BeautifulSoup
 from datetime import datetime
 import os
 import json
 import hashlib
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import Optional
-from slugify import slugify
 
-from typing import List
+from config import settings
 from database import mongo_instance
+from services.book_writer import BookBatchWriter
+from services.changelog import changelog_entry
+from services.price_history import record_observations
+from services.frontier import CrawlFrontier
+from services.snapshot_store import SnapshotStore
+from services.snapshot_archive import SnapshotArchive
+from services.throttle import (
+    HostThrottle,
+    parse_retry_after,
+    OK,
+    THROTTLED,
+    ERROR
+)
+from services.extractors import (
+    get_extractor,
+    init_worker,
+    run_extractor
+)
 import logging
 
-from book.models import (
-    BookSchema,
-    ChangeLog,
-    UrlRecordSchema
-)
+from book.models import BookSchema
 
 
 
@@ -38,188 +52,434 @@ logger = logging.getLogger(__name__)
 class CrawlerEngine:
     BASE_URL = "https://books.toscrape.com/"
     CATALOGUE_URL = BASE_URL + "catalogue/page-{}.html"
-    CONCURRENT_REQUESTS = 10
+    CONCURRENT_REQUESTS = 10  # starting per-host limit, adapted at runtime
+    MIN_CONCURRENT_REQUESTS = 1
+    MAX_CONCURRENT_REQUESTS = 64
+    TARGET_P95_LATENCY = 2.0  # seconds
+    METRICS_INTERVAL = 30  # seconds
+    LIST_WORKERS = 4
+    QUEUE_SIZE = 100
+    FRONTIER_POLL_INTERVAL = 0.5
     RETRIES = 3
+    MAX_RETRY_AFTER = 120  # seconds; a host asking for a longer pause is given up on for this url
     TIMEOUT = 15
+    HTTP2 = True
+    KEEPALIVE_EXPIRY = 60  # seconds an idle connection is kept for reuse
+    USER_AGENT = "BookCrawler/1.0"
+    EXTRACTOR = "lxml"
 
-    def __init__(self, output_dir: str = "./data/snapshots"):
+    def __init__(
+        self,
+        output_dir: str = "./data/snapshots",
+        extractor: str = None,
+        parse_mode: str = None,
+        parser_workers: int = None,
+        parser_queue_depth: int = None
+    ):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        if settings.SNAPSHOT_BACKEND == "archive":
+            self.snapshots = SnapshotArchive(settings.SNAPSHOT_ARCHIVE_DIR)
+        else:
+            self.snapshots = SnapshotStore(output_dir)
+        self.extractor = get_extractor(extractor or self.EXTRACTOR, self.BASE_URL)
+        self.parse_mode = parse_mode or settings.PARSE_MODE
+        self.parser_workers = parser_workers or settings.PARSER_WORKERS
+        self.parser_queue_depth = parser_queue_depth or settings.PARSER_QUEUE_DEPTH
+        self.parser_pool: Optional[ProcessPoolExecutor] = None
+        self.parse_slots: Optional[asyncio.Semaphore] = None
+        self.writer: Optional[BookBatchWriter] = None
+        self.frontier: Optional[CrawlFrontier] = None
+        self.in_flight = 0
+        self.throttle = HostThrottle(
+            initial=self.CONCURRENT_REQUESTS,
+            min_limit=self.MIN_CONCURRENT_REQUESTS,
+            max_limit=self.MAX_CONCURRENT_REQUESTS,
+            target_p95=self.TARGET_P95_LATENCY
+        )
+        self.http_stats = {"requests": 0, "connections": 0, "tls_handshakes": 0, "versions": {}}
+        self.known_books: dict[str, dict] = {}
+        self.stats = {"list_pages": 0, "new": 0, "changed": 0, "skipped": 0, "not_modified": 0}
+
+    def make_client(self) -> httpx.AsyncClient:
+        """
+        The one client of a run. Its pool is sized to the highest concurrency
+        the throttle can reach so every in-flight request reuses a warm
+        connection (and its DNS lookup and TLS session), multiplexed over
+        HTTP/2 when the server supports it.
+        """
+        http2 = self.HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("h2 is not installed, falling back to HTTP/1.1")
+                http2 = False
+        limits = httpx.Limits(
+            max_connections=self.MAX_CONCURRENT_REQUESTS,
+            max_keepalive_connections=self.MAX_CONCURRENT_REQUESTS,
+            keepalive_expiry=self.KEEPALIVE_EXPIRY
+        )
+        return httpx.AsyncClient(
+            headers={"User-Agent": self.USER_AGENT},
+            http2=http2,
+            limits=limits,
+            timeout=self.TIMEOUT
+        )
+
+    async def trace_connection(self, event_name: str, info: dict):
+        """httpcore trace hook: counts new connections so reuse can be checked against requests."""
+        if event_name == "connection.connect_tcp.complete":
+            self.http_stats["connections"] += 1
+        elif event_name == "connection.start_tls.complete":
+            self.http_stats["tls_handshakes"] += 1
 
     async def fetch(self, client: httpx.AsyncClient, url: str) -> Optional[str]:
+        response = await self.fetch_response(client, url)
+        return response.text if response else None
+
+    async def fetch_response(self, client: httpx.AsyncClient, url: str, headers: dict = None) -> Optional[httpx.Response]:
+        """
+        Fetch `url` with retries. A 304 answer to a conditional request is
+        returned as is; callers check `status_code` before reading the body.
+        """
+        limiter = self.throttle.for_host(httpx.URL(url).host)
         for attempt in range(1, self.RETRIES + 1):
+            outcome, retry_after = ERROR, None
+            await limiter.acquire()
+            started = time.perf_counter()
             try:
-                response = await client.get(url, timeout=self.TIMEOUT)
+                self.http_stats["requests"] += 1
+                response = await client.get(
+                    url,
+                    headers=headers,
+                    timeout=self.TIMEOUT,
+                    extensions={"trace": self.trace_connection}
+                )
+                versions = self.http_stats["versions"]
+                versions[response.http_version] = versions.get(response.http_version, 0) + 1
+                if response.status_code in (429, 503):
+                    outcome = THROTTLED
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if retry_after is not None and retry_after > self.MAX_RETRY_AFTER:
+                        # Pause the host for the cap only; the url goes back to the frontier
+                        logger.warning(f"Retry-After {retry_after:.0f}s is over {self.MAX_RETRY_AFTER}s, giving up: {url}")
+                        retry_after = self.MAX_RETRY_AFTER
+                        return None
+                elif response.status_code < 500:
+                    outcome = OK
+                if response.status_code == 304:
+                    logger.info(f"Not modified: {url}")
+                    return response
                 response.raise_for_status()
                 logger.info(f"Successfully scraped: {url}")
-                return response.text
+                return response
             except httpx.RequestError as e:
                 logger.warning(f"[Attempt {attempt}] Network error: {e}: {url}")
             except httpx.HTTPStatusError as e:
                 logger.warning(f"[Attempt {attempt}] HTTP error {e.response.status_code}: {url}")
-            await asyncio.sleep(attempt)  # exponential backoff
+                if outcome == OK:
+                    return None  # 4xx other than 429 will not get better on retry
+            finally:
+                await limiter.release(time.perf_counter() - started, outcome, retry_after)
+            await asyncio.sleep(retry_after if retry_after is not None else attempt)
         logger.error(f"❌ Failed after {self.RETRIES} retries: {url}")
         return None
 
+    def metrics(self) -> dict:
+        """Current per-host concurrency limits, latency percentiles, connection reuse and snapshot writes."""
+        return {"hosts": self.throttle.snapshot(), "http": self.http_stats, "snapshots": self.snapshots.metrics()}
+
+    async def report_metrics(self):
+        while True:
+            await asyncio.sleep(self.METRICS_INTERVAL)
+            logger.info(f"Metrics: {self.metrics()}")
+
+    def start_parser_pool(self):
+        """In "process" mode, parse HTML in worker processes so fetching never waits on parsing."""
+        if self.parse_mode != "process" or self.parser_pool:
+            return
+        self.parser_pool = ProcessPoolExecutor(
+            max_workers=self.parser_workers,
+            initializer=init_worker,
+            initargs=(self.extractor.name, self.BASE_URL)
+        )
+        # Bounds the HTML waiting in the pool so memory stays flat under load
+        self.parse_slots = asyncio.Semaphore(self.parser_queue_depth)
+        logger.info(f"Parser pool started: {self.parser_workers} workers, queue depth {self.parser_queue_depth}")
+
+    def stop_parser_pool(self):
+        if self.parser_pool:
+            self.parser_pool.shutdown()
+            self.parser_pool = None
+            self.parse_slots = None
+
+    async def parse(self, method: str, html: str):
+        """Run an extractor method (`parse_book`, `parse_book_links`, ...) inline or on the pool."""
+        if self.parser_pool is None:
+            return getattr(self.extractor, method)(html)
+        async with self.parse_slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.parser_pool, run_extractor, method, html)
+
     async def get_total_pages(self, client: httpx.AsyncClient) -> int:
         first_page = await self.fetch(client, self.CATALOGUE_URL.format(1))
         if not first_page:
             return 1
-        soup = BeautifulSoup(first_page, "html.parser")
-        pager = soup.select_one("li.current")
-        if pager:
-            text = pager.text.strip()
-            try:
-                total_pages = int(text.split("of")[-1].strip())
-                return total_pages
-            except ValueError:
-                pass
-        return 1
+        return await self.parse("parse_total_pages", first_page) or 1
 
     async def crawl_page(self, client: httpx.AsyncClient, url, db) -> list[str]:
+        """Crawl a catalogue page and return the detail urls it added to the frontier."""
         html = await self.fetch(client, url)
         if not html:
+            await self.frontier.release(url)
             return []
 
-        soup = BeautifulSoup(html, "html.parser")
-        books = soup.select("article.product_pod h3 a")
         book_links = [
-            self.BASE_URL + "catalogue/" + a["href"].replace("../../../", "")
-            for a in books
+            self.BASE_URL + "catalogue/" + href.replace("../../../", "")
+            for href in await self.parse("parse_book_links", html)
         ]
         print(f"✅ Page {url}: Found {len(book_links)} books")
-        await db["url_record"].update_one(
-            {"url": url},
-            [{"$set": {"status": True}}],
-            upsert=False
-        )
-        await self.save_urls(db, book_links, type="detail")
-        return book_links
+        new_links = await self.frontier.add(book_links, type="detail")
+        await self.frontier.complete([url])
+        return new_links
 
     async def book_info_create_or_update(self, db, book):
         book = book.dict()
         old_book = await db["book"].find_one({"source_url": book["source_url"]})
         if old_book:
-            changelog = ChangeLog(
-                book_id=str(old_book["_id"]),
-                details=book
-            )
+            changelog = changelog_entry(old_book, book)
+            if changelog:
+                await db["changelog"].insert_one(changelog)
             book["created_at"] = old_book["created_at"]
-            await db["changelog"].insert_one(changelog.dict())
         await db["book"].update_one(
             {"source_url": book["source_url"]},
             [{"$set": book}],
             upsert=True
         )
+        await record_observations(db, [book])
+
+    async def load_known_books(self, db):
+        """
+        Preload `source_url -> {content_hash, etag, last_modified}` so unchanged
+        pages can be revalidated or skipped without parsing, along with the
+        prices recorded in the price history when they are.
+        """
+        self.known_books = {}
+        projection = {
+            "source_url": 1, "content_hash": 1, "etag": 1, "last_modified": 1, "_id": 0,
+            "category": 1, "price_incl_tax": 1, "price_excl_tax": 1, "availability": 1
+        }
+        async for doc in db["book"].find({}, projection):
+            self.known_books[doc["source_url"]] = doc
+        logger.info(f"Loaded {len(self.known_books)} known books")
+
+    @staticmethod
+    def conditional_headers(known: Optional[dict]) -> dict:
+        headers = {}
+        if known and known.get("etag"):
+            headers["If-None-Match"] = known["etag"]
+        if known and known.get("last_modified"):
+            headers["If-Modified-Since"] = known["last_modified"]
+        return headers
+
+    async def mark_url_done(self, db, url: str, fields: dict = None, known: dict = None):
+        if self.writer:
+            await self.writer.mark_done(url, fields, observed=known)
+            return
+        await self.frontier.complete([url])
+        if fields:
+            await db["book"].update_one({"source_url": url}, {"$set": fields})
+        if known:
+            await record_observations(db, [known])
 
     async def crawl_book(self, client: httpx.AsyncClient, url: str, db) -> Optional[BookSchema]:
-        html = await self.fetch(client, url)
-        if not html:
+        known = self.known_books.get(url)
+        response = await self.fetch_response(client, url, headers=self.conditional_headers(known))
+        if response is None:
+            await self.frontier.release(url)
+            return None
+        if response.status_code == 304:
+            self.stats["not_modified"] += 1
+            await self.mark_url_done(db, url, known=known)
             return None
 
-        soup = BeautifulSoup(html, "html.parser")
+        html = response.text
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+        content_hash = hashlib.md5(html.encode("utf-8")).hexdigest()
+        known_hash = known["content_hash"] if known else None
+        if known_hash == content_hash:
+            self.stats["skipped"] += 1
+            await self.mark_url_done(db, url, {"etag": etag, "last_modified": last_modified}, known)
+            return None
 
         try:
-            title = soup.select_one(".product_main h1").text.strip()
-            price_incl = soup.select_one("th:contains('Price (incl. tax)') + td").text.strip().replace("£", "")
-            price_excl = soup.select_one("th:contains('Price (excl. tax)') + td").text.strip().replace("£", "")
-            availability = soup.select_one(".availability").text.strip()
-            category = soup.select("ul.breadcrumb li a")[-1].text.strip()
-            num_reviews = int(soup.select_one("th:contains('Number of reviews') + td").text.strip())
-            rating = soup.select_one(".star-rating")["class"][1]
-            image_url = soup.select_one("div.item.active img")["src"].replace("../../", self.BASE_URL)
-
-            desc_el = soup.select_one("#product_description + p")
-            description = desc_el.text.strip() if desc_el else ""
-
-            content_hash = hashlib.md5(html.encode("utf-8")).hexdigest()
-
-            html_path = self.output_dir / f"{slugify(title)}.html"
-            with open(html_path, "w", encoding="utf-8") as f:
-                f.write(html)
-
-            await db["url_record"].update_one(
-                    {"url": url},
-                    [{"$set": {"status": True}}],
-                    upsert=False
-                )
+            fields = await self.parse("parse_book", html)
+
+            html_path = await self.snapshots.put(url, content_hash, html)
+
             book = BookSchema(
-                title=title,
-                description=description,
-                category=category,
-                price_incl_tax=float(price_incl),
-                price_excl_tax=float(price_excl),
-                availability=availability,
-                num_reviews=num_reviews,
-                rating=rating,
-                image_url=image_url,
+                **fields,
                 source_url=url,
-                raw_html_path=str(html_path),
+                raw_html_path=html_path,
                 content_hash=content_hash,
+                etag=etag,
+                last_modified=last_modified,
                 created_at=datetime.utcnow()
             )
-            await self.book_info_create_or_update(db, book)
+            self.stats["changed" if known_hash else "new"] += 1
+            if self.writer:
+                await self.writer.add(book)
+            else:
+                await self.mark_url_done(db, url)
+                await self.book_info_create_or_update(db, book)
             return book
         except Exception as e:
             print(f"⚠️ Parsing error for {url}: {e}")
+            await self.frontier.release(url)
             return None
 
-    async def save_urls(self, db, urls: List[str], type="list"):
-        try:
-            records = [
-                UrlRecordSchema(url=url, type=type, status=False).dict()
-                for url in urls
-            ]
-            result = await db["url_record"].insert_many(records, ordered=False)
-        except:
-            pass
+    async def feed_list_urls(self, list_queue: asyncio.Queue):
+        """
+        Lease list urls until none is pending: a page that failed is released
+        and leased again, and one leased by a dead run comes back once its
+        lease expires.
+        """
+        while True:
+            urls = await self.frontier.lease("list", self.LIST_WORKERS)
+            for url in urls:
+                await list_queue.put(url)
+            if urls:
+                continue
+            if not await self.frontier.has_pending("list"):
+                break
+            await asyncio.sleep(self.FRONTIER_POLL_INTERVAL)
+        for _ in range(self.LIST_WORKERS):
+            await list_queue.put(None)
 
-    async def scrape_detai_urls(self, db, urls):
-        async with httpx.AsyncClient(headers={"User-Agent": "BookCrawler/1.0"}) as client:
-                sem = asyncio.Semaphore(self.CONCURRENT_REQUESTS)
-                async def sem_task(url):
-                    async with sem:
-                        return await self.crawl_book(client, url["url"], db)
+    async def feed_detail_urls(self, detail_queue: asyncio.Queue, list_done: asyncio.Event):
+        """
+        Lease detail urls as the list workers add them. Stops once the list
+        stage is over and nothing is leasable, queued or still being crawled
+        (a failed url is released and can be leased again).
+        """
+        while True:
+            urls = await self.frontier.lease("detail", self.CONCURRENT_REQUESTS)
+            for url in urls:
+                await detail_queue.put(url)
+            if urls:
+                continue
+            if list_done.is_set() and detail_queue.empty() and self.in_flight == 0:
+                break
+            await asyncio.sleep(self.FRONTIER_POLL_INTERVAL)
+        for _ in range(self.MAX_CONCURRENT_REQUESTS):
+            await detail_queue.put(None)
 
-                detail_tasks = [sem_task(url) for url in urls]
-                all_books = await asyncio.gather(*detail_tasks)
+    async def list_worker(self, client: httpx.AsyncClient, db, list_queue: asyncio.Queue):
+        while True:
+            url = await list_queue.get()
+            if url is None:
+                return
+            try:
+                await self.crawl_page(client, url, db)
+                self.stats["list_pages"] += 1
+            except Exception as e:
+                logger.error(f"List worker failed on {url}: {e}")
+                await self.frontier.release(url)
 
-                books = [b.dict() for b in all_books if b]
-                logger.info(f"Crawled {len(books)} books successfully.")
-                return books
+    async def detail_worker(self, client: httpx.AsyncClient, db, detail_queue: asyncio.Queue):
+        while True:
+            url = await detail_queue.get()
+            if url is None:
+                return
+            self.in_flight += 1
+            try:
+                await self.crawl_book(client, url, db)
+            except Exception as e:
+                logger.error(f"Detail worker failed on {url}: {e}")
+                await self.frontier.release(url)
+            finally:
+                self.in_flight -= 1
+
+    async def start_cycle(self, client: httpx.AsyncClient):
+        """Begin a new crawl cycle, or resume the current one if it still has pending urls."""
+        if await self.frontier.has_pending():
+            logger.info(f"Resume scraping: {await self.frontier.pending()} pending urls in the frontier")
+            return
+        await self.frontier.reset()
+        total_pages = await self.get_total_pages(client)
+        print(f"📘 Total pages detected: {total_pages}")
+        urls = [self.CATALOGUE_URL.format(page_number) for page_number in range(1, total_pages + 1)]
+        await self.frontier.add(urls, type="list")
+
+    async def crawl_pipeline(self, client: httpx.AsyncClient, db):
+        """
+        Stream the crawl through bounded queues fed from the frontier:
+
+            frontier -> list workers -> frontier -> detail workers -> parser -> BookBatchWriter
+
+        Detail pages start as soon as the first list page is parsed, and the
+        bounded queues keep memory flat regardless of catalogue size.
+        """
+        list_queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        detail_queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        list_done = asyncio.Event()
+        self.writer = BookBatchWriter(db)
+        await self.writer.start()
+        list_workers, detail_workers, feeders = [], [], []
+        try:
+            list_workers = [
+                asyncio.create_task(self.list_worker(client, db, list_queue))
+                for _ in range(self.LIST_WORKERS)
+            ]
+            detail_workers = [
+                # Enough workers for the highest limit; the throttle decides how many fetch at once
+                asyncio.create_task(self.detail_worker(client, db, detail_queue))
+                for _ in range(self.MAX_CONCURRENT_REQUESTS)
+            ]
+            feeders = [
+                asyncio.create_task(self.feed_detail_urls(detail_queue, list_done)),
+                asyncio.create_task(self.report_metrics())
+            ]
+            await self.feed_list_urls(list_queue)
+            await asyncio.gather(*list_workers)
+            list_done.set()
+            await asyncio.gather(feeders[0], *detail_workers)
+        finally:
+            for task in list_workers + detail_workers + feeders:
+                task.cancel()
+            await self.writer.close()
+            self.writer = None
 
     async def run(self):
         logger.info("Start scraping ---------------- ")
         try:
             await mongo_instance.connect()
             db = mongo_instance.db
-            urls = await db["url_record"].find({"status": False}).to_list(length=None)
-            if len(urls) > 0:
-                logger.info(f"Resume scraping: {len(urls)} pages(list) to scrape resumed")
         except:
             return
-        
-        
-        if len(urls) < 1:
-            async with httpx.AsyncClient(headers={"User-Agent": "BookCrawler/1.0"}) as client:
-                print("not enter to create url")
-                total_pages = await self.get_total_pages(client)
-                print(f"📘 Total pages detected: {total_pages}")
-                urls = [self.CATALOGUE_URL.format(page_number) for page_number in range(1, total_pages + 1)]
-                await self.save_urls(db, urls)
-        
-        urls = await db["url_record"].find({"status": False, "type": "list"}).to_list(length=None)
-        async with httpx.AsyncClient(headers={"User-Agent": "BookCrawler/1.0"}) as client:
-            page_tasks = [self.crawl_page(client, url["url"], db) for url in urls]
-            results = await asyncio.gather(*page_tasks)
-            logger.info(f"Crawled {len(results)} list of page successfully")
-                
-
-        all_book_urls = await db["url_record"].find({"status": False, "type": "detail"}).to_list(length=None)
-        print(f"Detail url {len(all_book_urls)}")
-        results = await self.scrape_detai_urls(db, all_book_urls)
-        
-        results = await db["url_record"].delete_many({})
+
+        self.start_parser_pool()
+        try:
+            await self.load_known_books(db)
+            self.frontier = CrawlFrontier(db)
+            async with self.make_client() as client:
+                await self.start_cycle(client)
+                await self.crawl_pipeline(client, db)
+            logger.info(
+                f"Crawl summary: {self.stats['list_pages']} list pages, "
+                f"{self.stats['new']} new, {self.stats['changed']} changed, "
+                f"{self.stats['skipped']} unchanged (skipped), "
+                f"{self.stats['not_modified']} not modified (304)"
+            )
+            logger.info(f"Metrics: {self.metrics()}")
+            logger.info(f"Snapshot store size: {await asyncio.to_thread(self.snapshots.disk_usage)} bytes")
+            if not await self.frontier.has_pending():
+                logger.info("Crawl cycle complete")
+        finally:
+            self.stop_parser_pool()
         await mongo_instance.close()
 
 
@@ -9,16 +9,23 @@ import math
 
 from ebay.MainOpsV2 import EbayScraper
 from ebay.models import SearchQuery, EbayData, Proxy
-import requests
+import httpx
 from bs4 import BeautifulSoup
 import os
 import math
+import time
 
 
 
 from playwright.async_api import async_playwright
 from datetime import datetime
 
+from services.browser_pool import BrowserPagePool
+from services.fetch_router import BROWSER, HTTP, FetchRouter
+from services.http_pool import ProxyClientPool
+from services.proxy_pool import BLOCKED, ProxyPool
+from services.throttle import ERROR, OK
+from services.scheduler import SlidingWindowScheduler
 
 HEADLESS = False
 
@@ -40,20 +47,22 @@ if not os.path.exists(BASE_DIR):
 
 class EbayScraperEngine:
 	BLOCK_TITLE = "Pardon our interruption..."
+	LIST_SELECTOR = ".srp-results"  # present on every rendered search results page
+	CONCURRENCY = 16  # list pages in flight when running without proxies
 	
 	def __init__(self, search_queries, proxies):
 		self.search_queries = search_queries
 		self.proxies = proxies
-		self.current_proxy = None
-		if len(proxies):
-			self.current_proxy = proxies.pop()
+		# Every proxy serves several requests at once; blocked ones cool down and come back
+		self.proxy_pool = ProxyPool(proxies)
 		self.headers = {
 			'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
 			'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
 			'Accept-Language': 'en-US,en;q=0.5',
-			'Accept-Encoding': 'gzip, deflate',
-			'Connection': 'keep-alive',
 		}
+		# Created inside the running loop by the scraping entry points
+		self.http = None
+		self.fetch_router = FetchRouter()
 		self.list_urls = []
 		self.list_blocked = []
 		self.list_completed = []
@@ -62,12 +71,8 @@ class EbayScraperEngine:
 		self.IS_LIST_MY_IP_BLOCK = False
 		self.IS_DETAIL_MY_IP_BLOCK = False
 
-		self.playwright = None
-		self.browser = None
-		self.context = None
-		self.page_queue = asyncio.Queue()
-		self.pages = []
-		self.pool_size = self.BATCH_SIZE
+		# One browser per run, its pages shared by every browser fetch
+		self.browser_pool = BrowserPagePool(size=self.BATCH_SIZE, headless=HEADLESS)
 	
 
 
@@ -76,32 +81,12 @@ class EbayScraperEngine:
 
 	async def start(self):
 		print("playwright start")
-		self.playwright = await async_playwright().start()
-		self.browser = await self.playwright.chromium.launch(headless=HEADLESS)
-		self.context = await self.browser.new_context()
-
-		for _ in range(self.BATCH_SIZE):
-			page = await self.context.new_page()
-			self.pages.append(page)
-			await self.page_queue.put(page)
-		print(f"[POOL] Initialized {self.BATCH_SIZE} pages.")
-
-	async def acquire_page(self):
-		"""Get an available page from the pool."""
-		page = await self.page_queue.get()
-		print("[POOL] Page acquired.")
-		return page
-
-	async def release_page(self, page):
-		"""Return a page to the pool."""
-		await self.page_queue.put(page)
-		print("[POOL] Page released.")
+		await self.browser_pool.start()
 
 	async def close(self):
 		"""Close browser and stop Playwright."""
-		await self.browser.close()
-		await self.playwright.stop()
-		print("[POOL] Closed Playwright.")
+		print(f"[POOL] {self.browser_pool.metrics()}")
+		await self.browser_pool.close()
 
 	# async def __aenter__(self):
 	# 	await self.start()
@@ -117,82 +102,79 @@ class EbayScraperEngine:
 		return url
 
 	async def browser_request(self, obj):
-		page = await self.acquire_page()
-		url = obj["url"].split("?")[0]
-		url = self.convert_ebay_url(url)
+		# The full list url: the query string is the search and the page number
+		url = self.convert_ebay_url(obj["url"])
 		try:
-			await page.goto(url, wait_until="load", timeout=15*1000)
-			await page.wait_for_selector(".vi-body", timeout=10*1000)
-			return await page.content()
+			# The page goes back to the pool however this ends
+			async with self.browser_pool.page() as page:
+				await page.goto(url, wait_until="load", timeout=15*1000)
+				await page.wait_for_selector(self.LIST_SELECTOR, timeout=10*1000)
+				return await page.content()
 		except Exception as e:
-			print(f"Playwright exception in get_detail: {e}")
+			print(f"Playwright exception in browser_request: {e}")
 			return None
 
 	async def python_request(self, obj, proxy=None):
 		try:
-			response = requests.get(obj["url"], headers=self.headers)
-			# print(response.text)
+			response = await self.http.get(obj["url"], proxy=proxy)
 			return response.text
-		except Exception as e:
-			print(f"Python exception in scrape_by_python: {e}")
+		except httpx.HTTPError as e:
+			print(f"Python exception in scrape_by_python: {e!r}")
 			return None
 	
-	def update_proxy(self):
-		try:
-			self.current_proxy = self.proxies.pop()
-		except:
-			self.current_proxy = None
-	
+	@property
+	def concurrency(self):
+		"""Requests in flight: every proxy's share, or CONCURRENCY without proxies."""
+		if len(self.proxy_pool):
+			return len(self.proxy_pool) * self.proxy_pool.max_in_flight
+		return self.CONCURRENCY
+
 	async def fetch_data(self, obj):
-		if self.current_proxy is None:
-			self.update_proxy()
-
-		if self.current_proxy:
-			response = await self.python_request(obj)
-			soup = BeautifulSoup(response, parser="html.parser")
-			if EbayScraperEngine.is_block_verify(soup):
-				self.update_proxy()
-				return await self.browser_request(obj)
-			else:
-				return response
+		lease = await self.proxy_pool.acquire()
+		proxy = lease.proxy if lease else None
+		try:
+			# Straight to the browser while this proxy / url pattern keeps getting blocked
+			if self.fetch_router.choose(obj["url"], proxy) == HTTP:
+				response = await self.python_request(obj, proxy)
+				if response is None:
+					# A transport error says nothing about blocking; the router only counts it
+					self.fetch_router.record_failure(obj["url"], HTTP)
+					if lease:
+						lease.outcome = ERROR
+				else:
+					blocked = EbayScraperEngine.is_response_blocked(response)
+					# Blocks through a proxy the pool already cools down are that proxy's, not the pattern's
+					cooling = bool(lease and lease.state.cooling_for(time.monotonic()))
+					self.fetch_router.record(obj["url"], proxy, HTTP, blocked, proxy_cooling=cooling)
+					if lease:
+						lease.outcome = BLOCKED if blocked else OK
+					if not blocked:
+						return response
+			elif lease:
+				# The proxy was not used, leave its score alone
+				lease.outcome = None
+		finally:
+			await self.proxy_pool.release(lease)
+
+		response = await self.browser_request(obj)
+		if response is None:
+			self.fetch_router.record_failure(obj["url"], BROWSER)
 		else:
-			return await self.browser_request(obj)
+			self.fetch_router.record(obj["url"], proxy, BROWSER, EbayScraperEngine.is_response_blocked(response))
+		return response
 	
-	async def get_detail(self, url, page):
+	async def get_detail(self, url):
 		print(url)
 		try:
-			await page.goto(url, wait_until="load", timeout=20*1000)
-			await page.wait_for_selector(".vi-body", timeout=10*1000)
-			return await page.content()
+			async with self.browser_pool.page() as page:
+				await page.goto(url, wait_until="load", timeout=20*1000)
+				await page.wait_for_selector(".vi-body", timeout=10*1000)
+				return await page.content()
 		except Exception as e:
 			print(f"Playwright exception in get_detail: {e}")
 			return None
 
 
-	async def fetch_browser_batch(self, batch):
-		async with async_playwright() as playwright:
-			browser = await playwright.chromium.launch(headless=HEADLESS)
-			context = await browser.new_context()
-			# Intercept image requests
-			await context.route(
-				"**/*",
-				lambda route: asyncio.create_task(
-					route.abort()
-					if route.request.resource_type == "image"
-					else route.continue_()
-				)
-			)
-			pages = [await context.new_page() for _ in range(len(batch))]
-
-			tasks = []
-			for url_obj, page in zip(batch, pages):
-				print(url_obj["url"])
-				tasks.append(self.get_detail(url_obj["url"], page))
-			data = await asyncio.gather(*tasks, return_exceptions=True)
-			return data
-		return []
-
-
 
 	def list_page_to_cards(self, soup):
 		try:
@@ -205,11 +187,18 @@ class EbayScraperEngine:
 	
 	@staticmethod
 	def is_block_verify(soup):
-		title = soup.title.string
-		if title == EbayScraperEngine.BLOCK_TITLE:
+		"""True for the bot-check page; a missing page counts as blocked, a missing <title> does not."""
+		if soup is None:
 			return True
-		else:
+		if soup.title is None:
 			return False
+		return soup.title.string == EbayScraperEngine.BLOCK_TITLE
+
+	@staticmethod
+	def is_response_blocked(response):
+		if response is None:
+			return True
+		return EbayScraperEngine.is_block_verify(BeautifulSoup(response, "html.parser"))
 
 	
 	@staticmethod
@@ -320,78 +309,74 @@ class EbayScraperEngine:
 			pages = [await context.new_page() for _ in range(50)]
 			await asyncio.sleep(5)
 
+	def store_list_page(self, url_obj, page_data):
+		"""Parse one list page and save its cards against the query that produced it."""
+		soup = BeautifulSoup(page_data, "html.parser") if page_data is not None else None
+		if EbayScraperEngine.is_block_verify(soup):
+			self.list_blocked.append(
+				url_obj
+			)
+		else:
+			cards = self.list_page_to_cards(soup)
+			card_info_list = EbayScraperEngine.card_list_to_dict(cards)
+			db_objs = []
+			print(card_info_list)
+			for card_info in card_info_list:
+				if card_info is None:
+					continue
+				# EbayData(
+				# 	search_query_id=url_obj["query_id"],
+				# 	card_id=card_info["card_id"],
+				# 	ebay_id=None,
+				# 	heading=card_info["heading"],
+				# 	brand=card_info["brand"],
+				# 	status=card_info["status"],
+				# 	price=card_info["price"],
+				# 	price_currency=card_info["price_currency"]
+				# )
+				db_objs.append(
+					EbayData(**card_info)
+				)
+			EbayData.objects.bulk_create(db_objs)
+			self.list_completed.append(
+				url_obj
+			)
+
 	def start_list_scraping(self):
-		batch_size = self.BATCH_SIZE
-		async def run_batches():
-			for i in range(0, len(self.list_urls), batch_size):
-				batch = self.list_urls[i:i+batch_size]
-				data = await asyncio.gather(*(self.fetch_data(url_obj) for url_obj in batch))
-				for i, page_data in enumerate(data):
-					soup = BeautifulSoup(page_data, parser="html.parser")
-					url_obj = self.list_urls[i]
-					if EbayScraperEngine.is_block_verify(soup):
-						self.list_blocked.append(
-							url_obj
-						)
-					else:
-						cards = self.list_page_to_cards(soup)
-						card_info_list = EbayScraperEngine.card_list_to_dict(cards)
-						db_objs = []
-						print(card_info_list)
-						for card_info in card_info_list:
-							if card_info is None:
-								continue
-							# EbayData(
-							# 	search_query_id=url_obj["query_id"],
-							# 	card_id=card_info["card_id"],
-							# 	ebay_id=None,
-							# 	heading=card_info["heading"],
-							# 	brand=card_info["brand"],
-							# 	status=card_info["status"],
-							# 	price=card_info["price"],
-							# 	price_currency=card_info["price_currency"]
-							# )
-							db_objs.append(
-								EbayData(**card_info)
-							)
-						EbayData.objects.bulk_create(db_objs)
-						self.list_completed.append(
-							url_obj
-						)
-		
+		async def run():
+			self.http = ProxyClientPool(self.headers, self.concurrency, self.proxy_pool.max_in_flight)
+			# One slot per request the proxies can carry; each refills as soon as its page is done
+			scheduler = SlidingWindowScheduler(self.concurrency)
+			try:
+				await scheduler.run(self.list_urls, self.fetch_data, self.store_list_page)
+			finally:
+				print(f"[SCHEDULER] {scheduler.metrics()}")
+				print(f"[HTTP] {self.http.metrics()}")
+				print(f"[ROUTER] {self.fetch_router.metrics()}")
+				print(f"[PROXIES] {self.proxy_pool.state()}")
+				await self.http.close()
+				if self.browser_pool.started:
+					await self.close()
+
 		# asyncio.run(self.start())
-		asyncio.run(run_batches())
+		asyncio.run(run())
 
 	async def start_batch_scraping(self):
-		batch_size = self.BATCH_SIZE
-		for i in range(0, len(self.list_urls), batch_size):
-			batch = self.list_urls[i:i+batch_size]
-			data = await self.fetch_browser_batch(batch)
-			# continue
-			for i, page_data in enumerate(data):
-				soup = BeautifulSoup(page_data, parser="html.parser")
-				url_obj = self.list_urls[i]
-				print(EbayScraperEngine.is_block_verify(soup))
-				continue
-				if EbayScraperEngine.is_block_verify(soup):
-					self.list_blocked.append(
-						url_obj
-					)
-				else:
-					cards = self.list_page_to_cards(soup)
-					card_info_list = EbayScraperEngine.card_list_to_dict(cards)
-					db_objs = []
-					print(card_info_list)
-					for card_info in card_info_list:
-						if card_info is None:
-							continue
-						db_objs.append(
-							EbayData(**card_info)
-						)
-					EbayData.objects.bulk_create(db_objs)
-					self.list_completed.append(
-						url_obj
-					)
+		await self.start()
+		try:
+			await self.scrape_batches()
+		finally:
+			await self.close()
+
+	async def scrape_batches(self):
+		# As many slots as browser pages
+		scheduler = SlidingWindowScheduler(self.BATCH_SIZE)
+
+		def report(url_obj, page_data):
+			print(url_obj["url"], EbayScraperEngine.is_response_blocked(page_data))
+
+		await scheduler.run(self.list_urls, lambda url_obj: self.get_detail(url_obj["url"]), report)
+		print(f"[SCHEDULER] {scheduler.metrics()}")
 
 
 
@@ -0,0 +1,205 @@
+"""
+Distributed crawl: one coordinator plans shards, any number of workers on any
+number of hosts claim them from the shared Mongo.
+
+    python distributed.py coordinator --buckets 8 --list-shard-size 10
+    python distributed.py worker                # on every host, as many as wanted
+    python distributed.py local --workers 4     # plan + spawn 4 worker processes here
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+from functools import partial
+
+from crawler import CrawlerEngine
+from database import mongo_instance
+from services.book_writer import BookBatchWriter
+from services.coordinator import CrawlCoordinator
+from services.frontier import CrawlFrontier
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 2  # seconds
+
+
+async def plan_cycle(list_shard_size: int = None, buckets: int = None):
+    await mongo_instance.connect()
+    db = mongo_instance.db
+    coordinator = CrawlCoordinator(db, list_shard_size, buckets)
+    engine = CrawlerEngine()
+    async with engine.make_client() as client:
+        total_pages = await engine.get_total_pages(client)
+    await CrawlFrontier(db).reset()
+    await coordinator.plan(total_pages)
+    await mongo_instance.close()
+
+
+async def drain_shard(
+    engine: CrawlerEngine,
+    coordinator: CrawlCoordinator,
+    shard: dict,
+    worker_id: str,
+    type: str,
+    query: dict,
+    workers: list,
+    done,
+    progress
+):
+    """
+    Lease the shard's urls into a bounded queue served by `workers`, the
+    list or detail workers of `crawl_pipeline`, so every slot takes the next
+    url as soon as it is free instead of waiting for a whole batch. Stops
+    once nothing is leasable and `done()` says the shard has nothing left.
+    `progress()` counts the pages crawled so far, reported with every heartbeat.
+    """
+    queue = asyncio.Queue(maxsize=engine.QUEUE_SIZE)
+    tasks = [asyncio.create_task(worker(queue)) for worker in workers]
+    reported = progress()
+    try:
+        while True:
+            urls = await engine.frontier.lease(type, len(tasks), query=query)
+            for url in urls:
+                await queue.put(url)
+            crawled, reported = progress() - reported, progress()
+            await coordinator.report(shard["_id"], worker_id, crawled)  # doubles as the heartbeat
+            if urls:
+                continue
+            if await done():
+                break
+            # Urls still in our queue or leased by a worker that may have died
+            await asyncio.sleep(POLL_INTERVAL)
+        for _ in tasks:
+            await queue.put(None)
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+    await coordinator.report(shard["_id"], worker_id, progress() - reported)
+
+
+async def crawl_list_shard(engine: CrawlerEngine, client, db, coordinator: CrawlCoordinator, shard: dict, worker_id: str):
+    """
+    Crawl the shard's catalogue pages through the frontier, so a page that
+    fails is released and retried (up to MAX_ATTEMPTS) before the shard is
+    finished and the detail stage can end.
+    """
+    urls = [engine.CATALOGUE_URL.format(page_number) for page_number in range(shard["start"], shard["end"] + 1)]
+    # Already present when the shard is claimed again after its worker died
+    await engine.frontier.add(urls, type="list")
+    in_shard = {"url": {"$in": urls}}
+
+    async def done() -> bool:
+        return not await engine.frontier.has_pending("list", query=in_shard)
+
+    await drain_shard(
+        engine, coordinator, shard, worker_id, "list", in_shard,
+        [partial(engine.list_worker, client, db) for _ in range(engine.LIST_WORKERS)],
+        done, lambda: engine.stats["list_pages"]
+    )
+    failed = await db["url_record"].count_documents({**in_shard, "status": False})
+    if failed:
+        logger.warning(f"[{worker_id}] shard {shard['_id']}: {failed} list pages failed after {engine.frontier.max_attempts} attempts")
+    await coordinator.finish(shard["_id"], worker_id)
+
+
+async def crawl_detail_shard(engine: CrawlerEngine, client, db, coordinator: CrawlCoordinator, shard: dict, worker_id: str):
+    """Drain one detail bucket; waits for more urls while list shards are still running."""
+    async def done() -> bool:
+        return await coordinator.list_stage_done() and not await engine.frontier.has_pending("detail", shard=shard["bucket"])
+
+    def crawled() -> int:
+        return sum(engine.stats[key] for key in ("new", "changed", "skipped", "not_modified"))
+
+    await drain_shard(
+        engine, coordinator, shard, worker_id, "detail", {"shard": shard["bucket"]},
+        # Enough workers for the highest limit; the throttle decides how many fetch at once
+        [partial(engine.detail_worker, client, db) for _ in range(engine.MAX_CONCURRENT_REQUESTS)],
+        done, crawled
+    )
+    await coordinator.finish(shard["_id"], worker_id)
+
+
+async def work_shards(engine: CrawlerEngine, client, db, coordinator: CrawlCoordinator, worker_id: str):
+    """Claim and crawl shards until every shard of the cycle is done."""
+    while True:
+        shard = await coordinator.claim(worker_id)
+        if shard is None:
+            if await coordinator.all_done():
+                return
+            await asyncio.sleep(POLL_INTERVAL)
+            continue
+        logger.info(f"[{worker_id}] claimed shard {shard['_id']}")
+        engine.frontier = CrawlFrontier(db, worker_id, buckets=shard["buckets"])
+        if shard["kind"] == "list":
+            await crawl_list_shard(engine, client, db, coordinator, shard, worker_id)
+        else:
+            await crawl_detail_shard(engine, client, db, coordinator, shard, worker_id)
+
+
+async def run_worker(worker_id: str = None):
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    await mongo_instance.connect()
+    db = mongo_instance.db
+    coordinator = CrawlCoordinator(db)
+    engine = CrawlerEngine()
+    engine.start_parser_pool()
+    try:
+        await engine.load_known_books(db)
+        engine.writer = BookBatchWriter(db)
+        await engine.writer.start()
+        async with engine.make_client() as client:
+            await work_shards(engine, client, db, coordinator, worker_id)
+    finally:
+        if engine.writer:
+            await engine.writer.close()
+            engine.writer = None
+        engine.stop_parser_pool()
+        await mongo_instance.close()
+    logger.info(f"[{worker_id}] done: {engine.stats} {engine.metrics()}")
+
+
+def worker_process(index: int):
+    asyncio.run(run_worker(f"{socket.gethostname()}:{os.getpid()}:{index}"))
+
+
+async def watch_progress(processes):
+    await mongo_instance.connect()
+    coordinator = CrawlCoordinator(mongo_instance.db)
+    while any(process.is_alive() for process in processes):
+        logger.info(f"Progress: {await coordinator.progress()}")
+        await asyncio.sleep(POLL_INTERVAL * 5)
+    logger.info(f"Final: {await coordinator.progress()}")
+    await mongo_instance.close()
+
+
+def run_local(workers: int, list_shard_size: int = None, buckets: int = None):
+    asyncio.run(plan_cycle(list_shard_size, buckets))
+    processes = [multiprocessing.Process(target=worker_process, args=(index,)) for index in range(workers)]
+    for process in processes:
+        process.start()
+    asyncio.run(watch_progress(processes))
+    for process in processes:
+        process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded multi-process crawl")
+    parser.add_argument("mode", choices=["coordinator", "worker", "local"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--buckets", type=int, default=CrawlCoordinator.DETAIL_BUCKETS)
+    parser.add_argument("--list-shard-size", type=int, default=CrawlCoordinator.LIST_SHARD_SIZE)
+    args = parser.parse_args()
+
+    if args.mode == "coordinator":
+        asyncio.run(plan_cycle(args.list_shard_size, args.buckets))
+    elif args.mode == "worker":
+        asyncio.run(run_worker())
+    else:
+        run_local(args.workers, args.list_shard_size, args.buckets)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@
 from fastapi import FastAPI
 from database import mongo_instance
 from book.routers import router as book_router
+from services.cache import use_shared_backend
+from services.rate_limiter import use_rate_limit_backend
 from apscheduler.schedulers.background import BackgroundScheduler
 
 from crawler import run_job
@@ -16,6 +18,8 @@ def job():
 @app.on_event("startup")
 async def startup_event():
     await mongo_instance.connect()
+    use_shared_backend(mongo_instance.db)
+    use_rate_limit_backend(mongo_instance.db)
     scheduler.add_job(job, "interval", seconds=3600*1)
     scheduler.start()
 
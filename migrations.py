@@ -1,7 +1,11 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 import asyncio
 
+from pymongo.errors import OperationFailure
+
+from config import settings
 from database import mongo_instance
+from services.price_history import create_collections as price_history_collections
 from book.schemas import (
     book_collection_schema,
     change_log_schema,
@@ -35,6 +39,22 @@ async def create_books_collection(db, name, validator):
     await db[name].create_index("source_url", unique=True)
     print("✅ Unique indexes on 'content_hash' and 'source_url' applied")
 
+    # Filter + keyset pagination on _id for GET /api/books
+    await db[name].create_index([("category", 1), ("rating", 1), ("_id", 1)])
+    await db[name].create_index([("rating", 1), ("_id", 1)])
+    await db[name].create_index([("availability", 1), ("_id", 1)])
+    # Equality, sort, range: the price filter is applied while walking _id order, no in-memory sort.
+    # Also serves category alone, as its (category, _id) prefix.
+    await db[name].create_index([("category", 1), ("_id", 1), ("price_incl_tax", 1)])
+    # Superseded: category_1_price_incl_tax_1 could not serve the keyset sort,
+    # category_1__id_1 is a prefix of the index above
+    for index in ("category_1_price_incl_tax_1", "category_1__id_1"):
+        try:
+            await db[name].drop_index(index)
+        except OperationFailure:
+            pass
+    print("✅ Query indexes on 'category', 'rating', 'availability' and 'price_incl_tax' applied")
+
 async def create_change_log_collection(db, name, validator):
     if name not in await db.list_collection_names():
         await create_schema(db, name, validator)
@@ -43,6 +63,20 @@ async def create_change_log_collection(db, name, validator):
         await update_schema(db, name, validator)
         print("✅ Collection 'changelog' validator updated")
 
+    await db[name].create_index([("book_id", 1), ("change_time", -1)])
+    retention = settings.CHANGELOG_RETENTION_DAYS * 24 * 3600
+    if retention:
+        try:
+            await db[name].create_index("change_time", expireAfterSeconds=retention)
+        except OperationFailure:
+            # The TTL index exists with another retention; change it in place
+            await db.command({
+                "collMod": name,
+                "index": {"keyPattern": {"change_time": 1}, "expireAfterSeconds": retention}
+            })
+        print(f"✅ Changelog entries expire after {settings.CHANGELOG_RETENTION_DAYS} days")
+    print("✅ Index on 'book_id', 'change_time' applied")
+
 async def url_record_collection(db, name, validator):
     if name not in await db.list_collection_names():
         await create_schema(db, name, validator)
@@ -51,7 +85,28 @@ async def url_record_collection(db, name, validator):
         await update_schema(db, name, validator)
         print(f"✅ Collection {name} validator updated")
     await db[name].create_index("url", unique=True)
+    await db[name].create_index([("type", 1), ("status", 1), ("priority", -1), ("timestamp", 1)])
+    await db[name].create_index([("type", 1), ("shard", 1), ("status", 1), ("priority", -1)])
     print("✅ Unique indexes on 'url_record_collection' and 'url' applied")
+    print("✅ Lease index on 'type', 'status', 'priority' applied")
+
+
+async def crawl_shard_collection(db, name):
+    await db[name].create_index([("status", 1), ("priority", -1)])
+    await db[name].create_index([("kind", 1), ("status", 1)])
+    print(f"✅ Indexes on {name} applied")
+
+
+async def api_cache_collection(db, name):
+    # Shared response cache entries expire on their own
+    await db[name].create_index("expires_at", expireAfterSeconds=0)
+    print(f"✅ TTL index on {name}.expires_at applied")
+
+
+async def rate_limit_collection(db, name):
+    # Keys idle for longer than their burst tolerance are dropped
+    await db[name].create_index("expires_at", expireAfterSeconds=0)
+    print(f"✅ TTL index on {name}.expires_at applied")
 
 
 async def start_migrations():
@@ -60,6 +115,10 @@ async def start_migrations():
     await create_books_collection(db, "book", book_collection_schema())
     await create_change_log_collection(db, "changelog", change_log_schema())
     await url_record_collection(db, "url_record", url_record_schema())
+    await crawl_shard_collection(db, "crawl_shard")
+    await api_cache_collection(db, "api_cache")
+    await price_history_collections(db)
+    await rate_limit_collection(db, "rate_limit")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+"""
+Rebuild the `book` collection from stored snapshots, without touching the network.
+
+Every book's `raw_html_path` (a snapshot store object, a `pack:` archive
+reference or a legacy loose .html file) is streamed through the extractor on
+a process pool and the changed fields are bulk-written back. Snapshots whose
+md5 is not the book's `content_hash` (legacy files were keyed by title, so
+they can hold another book's page) are skipped as `hash_mismatch`.
+
+    python reparse.py                    # re-extract everything and write the diffs
+    python reparse.py --dry-run          # only report what would change
+    python reparse.py --extractor bs4 --workers 8 --batch-size 500
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import Counter
+from typing import Optional
+
+from pymongo import UpdateOne
+
+from config import settings
+from crawler import CrawlerEngine
+from database import mongo_instance
+from services.cache import bump_version
+from services.snapshot_archive import SnapshotArchive, is_archive_ref
+from services.snapshot_store import read_snapshot
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+
+
+class Reparser:
+    def __init__(self, db, engine: CrawlerEngine, archive_dir: str = None, dry_run: bool = False):
+        self.db = db
+        self.engine = engine
+        self.archive_dir = archive_dir or settings.SNAPSHOT_ARCHIVE_DIR
+        self.archive: Optional[SnapshotArchive] = None
+        self.dry_run = dry_run
+        self.stats = Counter()
+        self.field_diffs = Counter()
+
+    async def load_html(self, raw_html_path: Optional[str]) -> Optional[str]:
+        if not raw_html_path:
+            return None
+        if is_archive_ref(raw_html_path):
+            if self.archive is None:
+                self.archive = SnapshotArchive(self.archive_dir)
+            return self.archive.get(raw_html_path.split(":", 1)[1])
+        if not os.path.exists(raw_html_path):
+            return None
+        return await asyncio.to_thread(read_snapshot, raw_html_path)
+
+    async def reparse_one(self, book: dict) -> Optional[UpdateOne]:
+        html = await self.load_html(book.get("raw_html_path"))
+        if html is None:
+            self.stats["missing_snapshot"] += 1
+            return None
+        if hashlib.md5(html.encode("utf-8")).hexdigest() != book.get("content_hash"):
+            logger.warning(f"Snapshot {book['raw_html_path']} does not match the content_hash of {book['source_url']}")
+            self.stats["hash_mismatch"] += 1
+            return None
+        try:
+            fields = await self.engine.parse("parse_book", html)
+        except Exception as e:
+            logger.warning(f"Parsing error for {book['source_url']}: {e}")
+            self.stats["parse_errors"] += 1
+            return None
+
+        changed = {key: value for key, value in fields.items() if book.get(key) != value}
+        if not changed:
+            self.stats["unchanged"] += 1
+            return None
+        self.stats["changed"] += 1
+        self.field_diffs.update(changed.keys())
+        return UpdateOne({"_id": book["_id"]}, {"$set": changed})
+
+    async def reparse_batch(self, books: list[dict]):
+        operations = [op for op in await asyncio.gather(*(self.reparse_one(book) for book in books)) if op]
+        self.stats["processed"] += len(books)
+        if operations and not self.dry_run:
+            await self.db["book"].bulk_write(operations, ordered=False)
+            await bump_version(self.db)
+
+    async def run(self, batch_size: int = BATCH_SIZE, query: dict = None):
+        started = time.perf_counter()
+        batch = []
+        async for book in self.db["book"].find(query or {}, batch_size=batch_size):
+            batch.append(book)
+            if len(batch) >= batch_size:
+                await self.reparse_batch(batch)
+                batch = []
+                self.log_progress(started)
+        if batch:
+            await self.reparse_batch(batch)
+        self.log_progress(started)
+        if self.archive:
+            self.archive.close()
+
+    def log_progress(self, started: float):
+        elapsed = time.perf_counter() - started
+        rate = self.stats["processed"] / elapsed if elapsed else 0
+        logger.info(
+            f"Reparsed {self.stats['processed']} books in {elapsed:.1f}s ({rate:.0f} docs/sec): "
+            f"{dict(self.stats)}, changed fields {dict(self.field_diffs)}"
+        )
+
+
+async def reparse(extractor: str = None, workers: int = None, batch_size: int = BATCH_SIZE, dry_run: bool = False):
+    await mongo_instance.connect()
+    engine = CrawlerEngine(extractor=extractor, parse_mode="process", parser_workers=workers)
+    engine.start_parser_pool()
+    try:
+        reparser = Reparser(mongo_instance.db, engine, dry_run=dry_run)
+        await reparser.run(batch_size)
+    finally:
+        engine.stop_parser_pool()
+        await mongo_instance.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-extract books from stored snapshots")
+    parser.add_argument("--extractor", default=CrawlerEngine.EXTRACTOR)
+    parser.add_argument("--workers", type=int, default=settings.PARSER_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="report diffs without writing")
+    args = parser.parse_args()
+    asyncio.run(reparse(args.extractor, args.workers, args.batch_size, args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,3 +7,4 @@ async def verify_api_key(x_api_key: str = Header(...)):
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API Key"
         )
+    return x_api_key
@@ -0,0 +1,213 @@
+import asyncio
+import time
+import logging
+from typing import Dict, List, Optional, Set
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from book.models import BookSchema
+from services.cache import bump_version
+from services.changelog import TRACKED_FIELDS, changelog_entry
+from services.price_history import record_observations
+
+logger = logging.getLogger(__name__)
+
+
+class BookBatchWriter:
+    """
+    Buffers parsed books and writes them to Mongo in batches.
+
+    Each flush costs four round trips no matter how many books are buffered:
+    one `find` on `source_url`, one `bulk_write` of upserts, one `insert_many`
+    for changelogs and one `update_many` on `url_record`. Urls whose content
+    did not change are only flagged in `url_record`; books that failed to
+    write are released back to the frontier instead. Flushes that wrote
+    books bump the response cache version. A flush that raises puts its
+    batch back, so the next flush (at the latest the one in `close()`)
+    retries it.
+    """
+    BATCH_SIZE = 50
+    FLUSH_INTERVAL = 5  # seconds
+
+    def __init__(self, db, batch_size: int = None, flush_interval: float = None):
+        self.db = db
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.flush_interval = flush_interval or self.FLUSH_INTERVAL
+        self.buffer: List[BookSchema] = []
+        self.done_urls: List[str] = []
+        self.touched: List[UpdateOne] = []
+        self.observed: List[dict] = []
+        self.lock = asyncio.Lock()
+        self.last_flush = time.monotonic()
+        self.flusher: Optional[asyncio.Task] = None
+        self.batches = []
+
+    async def start(self):
+        self.flusher = asyncio.create_task(self._flush_periodically())
+
+    async def close(self):
+        if self.flusher:
+            self.flusher.cancel()
+            try:
+                await self.flusher
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                logger.error(f"Periodic flusher died: {e!r}")
+            self.flusher = None
+        await self.flush()
+        self.log_summary()
+
+    async def add(self, book: BookSchema):
+        self.buffer.append(book)
+        await self._flush_if_full()
+
+    async def mark_done(self, url: str, fields: dict = None, observed: dict = None):
+        """
+        Flag a url as crawled without writing a book (e.g. unchanged content).
+        `fields` are set on the existing book document, e.g. fresh HTTP validators.
+        `observed` is the unchanged book, recorded in the price history.
+        """
+        self.done_urls.append(url)
+        if fields:
+            self.touched.append(UpdateOne({"source_url": url}, {"$set": fields}))
+        if observed:
+            self.observed.append({**observed, "source_url": url})
+        await self._flush_if_full()
+
+    async def _flush_if_full(self):
+        if len(self.buffer) + len(self.done_urls) >= self.batch_size:
+            await self.flush()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if time.monotonic() - self.last_flush >= self.flush_interval:
+                try:
+                    await self.flush()
+                except Exception as e:
+                    # The batch is back in the buffer; keep flushing on schedule
+                    logger.warning(f"Periodic flush failed, retrying in {self.flush_interval}s: {e!r}")
+
+    async def flush(self):
+        async with self.lock:
+            books, self.buffer = self.buffer, []
+            done_urls, self.done_urls = self.done_urls, []
+            touched, self.touched = self.touched, []
+            observed, self.observed = self.observed, []
+            self.last_flush = time.monotonic()
+            if not books and not done_urls:
+                return
+            started = time.perf_counter()
+            try:
+                failed = await self._write(books) if books else set()
+                if touched:
+                    await self.db["book"].bulk_write(touched, ordered=False)
+                if observed:
+                    await record_observations(self.db, observed)
+                await self._mark_urls_done(done_urls + [book.source_url for book in books if book.source_url not in failed])
+                if failed:
+                    await self._release_urls(list(failed))
+            except Exception:
+                # Nothing is dropped: the whole batch goes back in front of what was buffered meanwhile.
+                # Upserts are keyed on source_url, so writing a book twice is harmless.
+                self.buffer[:0] = books
+                self.done_urls[:0] = done_urls
+                self.touched[:0] = touched
+                self.observed[:0] = observed
+                raise
+            latency = time.perf_counter() - started
+            self.batches.append({"size": len(books), "latency": latency})
+            logger.info(f"Flushed batch of {len(books)} books in {latency * 1000:.1f} ms")
+
+    async def _write(self, books: List[BookSchema]) -> Set[str]:
+        """Upsert `books` and return the urls that failed to write."""
+        errors = {}
+        results = await upsert_books(self.db, books, errors)
+        if len(errors) < len(results):
+            await bump_version(self.db)
+        if errors:
+            logger.warning(f"Bulk write finished with {len(errors)} errors, releasing them for a retry: {errors}")
+        return set(errors)
+
+    async def _mark_urls_done(self, urls: List[str]):
+        await self.db["url_record"].update_many(
+            {"url": {"$in": urls}},
+            {"$set": {"status": True, "lease_until": None}}
+        )
+
+    async def _release_urls(self, urls: List[str]):
+        """Like CrawlFrontier.release: the url can be leased again until it runs out of attempts."""
+        await self.db["url_record"].update_many(
+            {"url": {"$in": urls}, "status": False},
+            {"$set": {"lease_until": None}}
+        )
+
+    def log_summary(self):
+        if not self.batches:
+            return
+        latencies = sorted(batch["latency"] for batch in self.batches)
+        total = sum(batch["size"] for batch in self.batches)
+        logger.info(
+            f"Writer: {total} books in {len(self.batches)} batches, "
+            f"avg {sum(latencies) / len(latencies) * 1000:.1f} ms, "
+            f"max {latencies[-1] * 1000:.1f} ms per batch"
+        )
+
+
+async def upsert_books(db, books: List[BookSchema], errors: Dict[str, dict] = None) -> Dict[str, str]:
+    """
+    Upsert `books` keyed on `source_url` with one unordered `bulk_write` and
+    write a field-level changelog entry for every existing book whose tracked
+    fields changed. Every written book is also recorded in the price history.
+    Returns `source_url -> "inserted" | "updated" | "error"`; when `errors` is
+    given it receives `source_url -> {code, message, details}` of every error.
+    """
+    # The same url can appear twice in one batch; keep the latest one
+    docs = {book.source_url: book.dict() for book in books}
+    urls = list(docs.keys())
+
+    old_books = {}
+    async for old_book in db["book"].find(
+        {"source_url": {"$in": urls}},
+        {"source_url": 1, "created_at": 1, **{field: 1 for field in TRACKED_FIELDS}}
+    ):
+        old_books[old_book["source_url"]] = old_book
+
+    operations = []
+    changelogs = {}
+    for url, book in docs.items():
+        old_book = old_books.get(url)
+        if old_book:
+            changelog = changelog_entry(old_book, book)
+            if changelog:
+                changelogs[url] = changelog
+            book["created_at"] = old_book["created_at"]
+        operations.append(
+            UpdateOne({"source_url": url}, {"$set": book}, upsert=True)
+        )
+
+    failed = set()
+    try:
+        await db["book"].bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details["writeErrors"]:
+            url = urls[error["index"]]
+            failed.add(url)
+            if errors is not None:
+                errors[url] = {
+                    "code": error["code"],
+                    "message": error["errmsg"],
+                    "details": error.get("errInfo") or error.get("keyValue"),
+                }
+
+    written = [changelog for url, changelog in changelogs.items() if url not in failed]
+    if written:
+        await db["changelog"].insert_many(written, ordered=False)
+    await record_observations(db, [book for url, book in docs.items() if url not in failed])
+
+    return {
+        url: "error" if url in failed else "updated" if url in old_books else "inserted"
+        for url in urls
+    }
@@ -0,0 +1,199 @@
+"""
+Long-lived Playwright page pool.
+
+One Chromium and one context are launched per run; a bounded set of pages
+is handed out through `async with pool.page() as page:`, which always puts
+the page back. Pages are recycled after MAX_USES navigations or when they
+fail a health check, and requests for blocked resource types or tracker
+hosts are aborted at the context level before they reach the network.
+"""
+import asyncio
+import os
+import re
+import time
+import logging
+from contextlib import asynccontextmanager
+from typing import Iterable, Optional
+
+from playwright.async_api import async_playwright
+
+logger = logging.getLogger(__name__)
+
+BLOCKED_RESOURCE_TYPES = ("image", "font", "media", "stylesheet")
+BLOCKED_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "facebook.net", "scorecardresearch.com", "criteo.com", "adnxs.com",
+)
+
+
+def process_tree_rss(root_pid: int = None) -> Optional[int]:
+    """RSS in bytes of a process and all of its descendants (Linux /proc only)."""
+    root_pid = root_pid or os.getpid()
+    if not os.path.isdir("/proc"):
+        return None
+    parents, rss = {}, {}
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            parents[int(pid)] = int(fields[1])
+            rss[int(pid)] = int(fields[21]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+    tree, frontier = {root_pid}, [root_pid]
+    while frontier:
+        parent = frontier.pop()
+        children = [pid for pid, ppid in parents.items() if ppid == parent and pid not in tree]
+        tree.update(children)
+        frontier.extend(children)
+    return sum(rss.get(pid, 0) for pid in tree)
+
+
+class BrowserPagePool:
+    POOL_SIZE = 3
+    MAX_USES = 50  # navigations before a page is replaced, bounds per-page memory growth
+    HEALTH_CHECK_TIMEOUT = 2  # seconds
+
+    def __init__(
+        self,
+        size: int = None,
+        headless: bool = True,
+        blocked_resource_types: Iterable[str] = BLOCKED_RESOURCE_TYPES,
+        blocked_hosts: Iterable[str] = BLOCKED_HOSTS,
+        max_uses: int = None
+    ):
+        self.size = size or self.POOL_SIZE
+        self.headless = headless
+        self.blocked_resource_types = set(blocked_resource_types)
+        self.blocked_hosts = re.compile(
+            r"^https?://([^/]+\.)?(" + "|".join(map(re.escape, blocked_hosts)) + r")(:\d+)?/"
+        ) if blocked_hosts else None
+        self.max_uses = max_uses or self.MAX_USES
+        self.playwright = None
+        self.browser = None
+        self.context = None
+        self.idle: asyncio.Queue = None
+        self.uses = {}
+        self.stats = {"pages_served": 0, "recycled": 0, "unhealthy": 0, "blocked_requests": 0}
+        self.started_at = None
+        self.launch_seconds = None
+        self.rss_before_launch = None  # process tree RSS without a browser
+        self.rss_without_pages = None  # ... with the browser and context, before any page
+        self.start_lock = None
+
+    async def start(self):
+        started = time.perf_counter()
+        self.rss_before_launch = process_tree_rss()
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(headless=self.headless)
+        self.context = await self.browser.new_context()
+        await self.context.route("**/*", self._route)
+        self.rss_without_pages = process_tree_rss()
+        self.idle = asyncio.Queue()
+        for _ in range(self.size):
+            await self.idle.put(await self._new_page())
+        self.launch_seconds = time.perf_counter() - started
+        self.started_at = time.perf_counter()
+        logger.info(f"[POOL] Initialized {self.size} pages in {self.launch_seconds:.2f}s")
+
+    async def _route(self, route):
+        request = route.request
+        if request.resource_type in self.blocked_resource_types or (
+            self.blocked_hosts and self.blocked_hosts.match(request.url)
+        ):
+            self.stats["blocked_requests"] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _new_page(self):
+        page = await self.context.new_page()
+        self.uses[page] = 0
+        return page
+
+    async def _healthy(self, page) -> bool:
+        if page.is_closed():
+            return False
+        try:
+            return await asyncio.wait_for(page.evaluate("1 + 1"), self.HEALTH_CHECK_TIMEOUT) == 2
+        except Exception:
+            return False
+
+    async def _replace(self, page):
+        self.uses.pop(page, None)
+        try:
+            if not page.is_closed():
+                await page.close()
+        except Exception as e:
+            logger.warning(f"[POOL] Closing a page failed: {e}")
+        return await self._new_page()
+
+    @property
+    def started(self) -> bool:
+        return self.idle is not None
+
+    async def acquire(self):
+        if not self.started:
+            # Launched on first use, so runs that never need a browser never pay for one
+            self.start_lock = self.start_lock or asyncio.Lock()
+            async with self.start_lock:
+                if not self.started:
+                    await self.start()
+        return await self.idle.get()
+
+    async def release(self, page, failed: bool = False):
+        """Return a page; it is replaced when it failed, is worn out or no longer responds."""
+        try:
+            self.uses[page] = self.uses.get(page, 0) + 1
+            if failed and not await self._healthy(page):
+                self.stats["unhealthy"] += 1
+                page = await self._replace(page)
+            elif self.uses[page] >= self.max_uses:
+                self.stats["recycled"] += 1
+                page = await self._replace(page)
+        finally:
+            await self.idle.put(page)
+
+    @asynccontextmanager
+    async def page(self):
+        page = await self.acquire()
+        failed = False
+        try:
+            yield page
+            self.stats["pages_served"] += 1
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            await self.release(page, failed)
+
+    def metrics(self) -> dict:
+        """
+        `rss_mb` is the whole process tree. `browser_rss_mb` is what launching
+        the browser and context added to it, and `rss_mb_per_page` is the growth
+        since then (the pages and their renderers) divided by the pool size.
+        """
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0
+        rss = process_tree_rss()
+        browser_rss = per_page_rss = None
+        if rss and self.rss_before_launch and self.rss_without_pages:
+            browser_rss = self.rss_without_pages - self.rss_before_launch
+            per_page_rss = max(0, rss - self.rss_without_pages) / self.size
+        return {
+            **self.stats,
+            "size": self.size,
+            "launch_seconds": round(self.launch_seconds, 2) if self.launch_seconds else None,
+            "pages_per_sec": round(self.stats["pages_served"] / elapsed, 2) if elapsed else None,
+            "rss_mb": round(rss / 1024 / 1024, 1) if rss else None,
+            "browser_rss_mb": round(browser_rss / 1024 / 1024, 1) if browser_rss is not None else None,
+            "rss_mb_per_page": round(per_page_rss / 1024 / 1024, 1) if per_page_rss is not None else None,
+        }
+
+    async def close(self):
+        if self.browser:
+            await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
+        self.browser = self.playwright = self.context = self.idle = None
+        logger.info("[POOL] Closed Playwright.")
@@ -0,0 +1,189 @@
+"""
+Read-through response cache for the read endpoints.
+
+Cached bodies are keyed by the request path and query string plus the
+catalogue version, a counter in the `cache_version` collection that
+BookBatchWriter bumps after every flush that wrote books. A crawl therefore
+never has to delete entries: the next request sees a new version, misses and
+reloads, while stale entries age out of the LRU or by TTL.
+
+Every response carries an ETag, so clients that send `If-None-Match` get a
+304 without a body.
+"""
+import hashlib
+import json
+import time
+import logging
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+VERSION_COLLECTION = "cache_version"
+SHARED_COLLECTION = "api_cache"
+
+
+class CacheBackend:
+    """Interface for a shared cache (several API processes behind one load balancer)."""
+
+    async def get(self, key: str) -> Optional[tuple[bytes, str]]:
+        raise NotImplementedError
+
+    async def set(self, key: str, body: bytes, etag: str, ttl: float):
+        raise NotImplementedError
+
+
+class MongoCacheBackend(CacheBackend):
+    """Shared entries in `api_cache`, expired by a TTL index on `expires_at`."""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def get(self, key: str) -> Optional[tuple[bytes, str]]:
+        entry = await self.db[SHARED_COLLECTION].find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}}
+        )
+        return (entry["body"], entry["etag"]) if entry else None
+
+    async def set(self, key: str, body: bytes, etag: str, ttl: float):
+        await self.db[SHARED_COLLECTION].replace_one(
+            {"_id": key},
+            {"body": body, "etag": etag, "expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl)},
+            upsert=True
+        )
+
+
+class LRUCache:
+    """In-process LRU with a per-entry TTL."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: OrderedDict[str, tuple[float, bytes, str]] = OrderedDict()
+
+    def get(self, key: str) -> Optional[tuple[bytes, str]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, body, etag = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return body, etag
+
+    def set(self, key: str, body: bytes, etag: str):
+        self.entries[key] = (time.monotonic() + self.ttl, body, etag)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class ResponseCache:
+    VERSION_CHECK_INTERVAL = 1.0  # seconds between reads of the catalogue version
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300, shared: Optional[CacheBackend] = None):
+        self.local = LRUCache(max_entries, ttl)
+        self.shared = shared
+        self.ttl = ttl
+        self.version = None
+        self.version_checked_at = 0.0
+        self.stats = {"hits": 0, "shared_hits": 0, "misses": 0, "not_modified": 0}
+        self.hit_latencies = deque(maxlen=1000)
+        self.miss_latencies = deque(maxlen=1000)
+
+    async def current_version(self, db) -> int:
+        if time.monotonic() - self.version_checked_at >= self.VERSION_CHECK_INTERVAL:
+            doc = await db[VERSION_COLLECTION].find_one({"_id": "book"})
+            self.version = doc["version"] if doc else 0
+            self.version_checked_at = time.monotonic()
+        return self.version
+
+    @staticmethod
+    def key_for(request: Request) -> str:
+        return f"{request.url.path}?{urlencode(sorted(request.query_params.multi_items()))}"
+
+    async def respond(self, request: Request, db, load: Callable[[], Awaitable], headers: dict = None) -> Response:
+        """Serve `load()` from the cache, revalidating with If-None-Match. `headers` are added to the response."""
+        started = time.perf_counter()
+        key = f"{await self.current_version(db)}:{self.key_for(request)}"
+
+        cached = self.local.get(key)
+        if cached:
+            self.stats["hits"] += 1
+        elif self.shared and (cached := await self.shared.get(key)):
+            self.stats["shared_hits"] += 1
+            self.local.set(key, *cached)
+
+        if cached:
+            body, etag = cached
+            latencies = self.hit_latencies
+        else:
+            self.stats["misses"] += 1
+            body = json.dumps(jsonable_encoder(await load())).encode("utf-8")
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            self.local.set(key, body, etag)
+            if self.shared:
+                await self.shared.set(key, body, etag, self.ttl)
+            latencies = self.miss_latencies
+
+        headers = {**(headers or {}), "ETag": etag, "Cache-Control": "max-age=0, must-revalidate"}
+        if request.headers.get("if-none-match") == etag:
+            self.stats["not_modified"] += 1
+            response = Response(status_code=304, headers=headers)
+        else:
+            response = Response(body, media_type="application/json", headers=headers)
+        latencies.append(time.perf_counter() - started)
+        return response
+
+    def invalidate(self):
+        """Force the next request to re-read the catalogue version."""
+        self.version_checked_at = 0.0
+
+    def metrics(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["shared_hits"] + self.stats["misses"]
+
+        def percentile(values, p):
+            ordered = sorted(values)
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000, 3) if ordered else None
+
+        return {
+            **self.stats,
+            "hit_ratio": round((self.stats["hits"] + self.stats["shared_hits"]) / lookups, 3) if lookups else None,
+            "entries": len(self.local.entries),
+            "version": self.version,
+            "hit_p50_ms": percentile(self.hit_latencies, 50),
+            "hit_p95_ms": percentile(self.hit_latencies, 95),
+            "miss_p50_ms": percentile(self.miss_latencies, 50),
+            "miss_p95_ms": percentile(self.miss_latencies, 95),
+        }
+
+
+async def bump_version(db, name: str = "book"):
+    """Called after writes to `book`; cached responses of the previous version stop matching."""
+    await db[VERSION_COLLECTION].update_one(
+        {"_id": name},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    response_cache.invalidate()
+
+
+response_cache = ResponseCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL)
+
+
+def use_shared_backend(db):
+    """Attach the shared backend once the database is connected (CACHE_BACKEND=mongo)."""
+    if settings.CACHE_BACKEND == "mongo":
+        response_cache.shared = MongoCacheBackend(db)
+        logger.info("Response cache shared through Mongo")
@@ -0,0 +1,29 @@
+from typing import List, Optional
+
+from book.models import (
+    ChangeLog,
+    FieldChange
+)
+
+# Fields that describe the book; crawl bookkeeping (timestamps, hashes, validators, paths) is not history
+TRACKED_FIELDS = (
+    "title", "description", "category", "price_incl_tax", "price_excl_tax",
+    "availability", "num_reviews", "rating", "image_url",
+)
+
+
+def diff_book(old: dict, new: dict) -> List[FieldChange]:
+    return [
+        FieldChange(field=field, old_value=old.get(field), new_value=new.get(field))
+        for field in TRACKED_FIELDS
+        if field in new and old.get(field) != new[field]
+    ]
+
+
+def changelog_entry(old: dict, new: dict) -> Optional[dict]:
+    """The changelog document for `old -> new`, or None when no tracked field changed."""
+    changes = diff_book(old, new)
+    if not changes:
+        return None
+    changelog = ChangeLog(book_id=str(old["_id"]), source_url=new["source_url"], changes=changes)
+    return changelog.dict()
@@ -0,0 +1,120 @@
+import zlib
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+
+def shard_of(url: str, buckets: int) -> int:
+    """Stable bucket of a url, identical in every process."""
+    return zlib.crc32(url.encode("utf-8")) % buckets
+
+
+class CrawlCoordinator:
+    """
+    Splits a crawl cycle into shards stored in the `crawl_shard` collection.
+
+    List shards cover a range of catalogue pages, detail shards cover one
+    bucket of the detail url space (`shard_of(url) == bucket`). Workers claim
+    shards with a lease, like the frontier does for urls, heartbeat progress
+    through `report()` and release them with `finish()`. A shard whose worker
+    died is claimed again once its lease expires.
+    """
+    LIST_SHARD_SIZE = 10
+    DETAIL_BUCKETS = 8
+    LEASE_SECONDS = 120
+
+    def __init__(self, db, list_shard_size: int = None, detail_buckets: int = None, lease_seconds: int = None):
+        self.collection = db["crawl_shard"]
+        self.list_shard_size = list_shard_size or self.LIST_SHARD_SIZE
+        self.detail_buckets = detail_buckets or self.DETAIL_BUCKETS
+        self.lease_seconds = lease_seconds or self.LEASE_SECONDS
+
+    async def plan(self, total_pages: int):
+        """Replace the previous cycle's shards with a fresh plan."""
+        await self.collection.delete_many({})
+        now = datetime.utcnow()
+        shards = []
+        for start in range(1, total_pages + 1, self.list_shard_size):
+            end = min(start + self.list_shard_size - 1, total_pages)
+            shards.append({
+                "_id": f"list-{start:05d}",
+                "kind": "list",
+                "start": start,
+                "end": end,
+                # List shards are handed out first, they feed the detail buckets
+                "priority": 1,
+            })
+        for bucket in range(self.detail_buckets):
+            shards.append({
+                "_id": f"detail-{bucket:03d}",
+                "kind": "detail",
+                "bucket": bucket,
+                "priority": 0,
+            })
+        for shard in shards:
+            shard.update({
+                "buckets": self.detail_buckets,
+                "status": "pending",
+                "processed": 0,
+                "worker": None,
+                "lease_until": None,
+                "created_at": now,
+                "updated_at": now,
+            })
+        await self.collection.insert_many(shards)
+        logger.info(f"Planned {total_pages} pages into {len(shards)} shards ({self.detail_buckets} detail buckets)")
+
+    async def claim(self, worker_id: str) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {
+                "status": {"$ne": "done"},
+                "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}],
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "worker": worker_id,
+                    "lease_until": now + timedelta(seconds=self.lease_seconds),
+                    "updated_at": now,
+                }
+            },
+            sort=[("priority", -1), ("_id", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def report(self, shard_id: str, worker_id: str, processed: int = 1):
+        """Record progress and extend the lease of a shard the worker still owns."""
+        now = datetime.utcnow()
+        await self.collection.update_one(
+            {"_id": shard_id, "worker": worker_id},
+            {
+                "$inc": {"processed": processed},
+                "$set": {"lease_until": now + timedelta(seconds=self.lease_seconds), "updated_at": now}
+            }
+        )
+
+    async def finish(self, shard_id: str, worker_id: str):
+        await self.collection.update_one(
+            {"_id": shard_id, "worker": worker_id},
+            {"$set": {"status": "done", "lease_until": None, "updated_at": datetime.utcnow()}}
+        )
+
+    async def list_stage_done(self) -> bool:
+        return await self.collection.count_documents({"kind": "list", "status": {"$ne": "done"}}, limit=1) == 0
+
+    async def all_done(self) -> bool:
+        return await self.collection.count_documents({"status": {"$ne": "done"}}, limit=1) == 0
+
+    async def progress(self) -> dict:
+        summary = {}
+        async for row in self.collection.aggregate([
+            {"$group": {"_id": {"kind": "$kind", "status": "$status"}, "shards": {"$sum": 1}, "processed": {"$sum": "$processed"}}}
+        ]):
+            key = f"{row['_id']['kind']}:{row['_id']['status']}"
+            summary[key] = {"shards": row["shards"], "processed": row["processed"]}
+        return summary
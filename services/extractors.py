@@ -0,0 +1,232 @@
+"""
+HTML extraction backends for the crawler.
+
+`SoupExtractor` is the reference implementation (the original BeautifulSoup
+selectors). `LxmlExtractor` reads the same fields with lxml, collecting the
+product-information table in a single pass instead of running one
+`:contains()` scan over the whole document per field.
+
+Parity between the two can be checked against saved snapshots:
+
+    python -m services.extractors ./data/snapshots
+"""
+import sys
+import logging
+from typing import Optional
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+except ImportError:  # lxml is optional, bs4 stays the fallback
+    lxml = None
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://books.toscrape.com/"
+
+
+class BaseExtractor:
+    name = "base"
+
+    def __init__(self, base_url: str = BASE_URL):
+        self.base_url = base_url
+
+    def parse_book(self, html: str) -> dict:
+        """Return the BookSchema fields found on a detail page. Raises when a required field is missing."""
+        raise NotImplementedError
+
+    def parse_book_links(self, html: str) -> list[str]:
+        """Return the raw `href` of every book on a catalogue page."""
+        raise NotImplementedError
+
+    def parse_total_pages(self, html: str) -> Optional[int]:
+        """Return the page count from the catalogue pager, or None."""
+        raise NotImplementedError
+
+    @staticmethod
+    def total_pages_from_pager(text: str) -> Optional[int]:
+        try:
+            return int(text.strip().split("of")[-1].strip())
+        except ValueError:
+            return None
+
+
+class SoupExtractor(BaseExtractor):
+    name = "bs4"
+
+    def parse_book(self, html: str) -> dict:
+        soup = BeautifulSoup(html, "html.parser")
+
+        title = soup.select_one(".product_main h1").text.strip()
+        price_incl = soup.select_one("th:contains('Price (incl. tax)') + td").text.strip().replace("£", "")
+        price_excl = soup.select_one("th:contains('Price (excl. tax)') + td").text.strip().replace("£", "")
+        availability = soup.select_one(".availability").text.strip()
+        category = soup.select("ul.breadcrumb li a")[-1].text.strip()
+        num_reviews = int(soup.select_one("th:contains('Number of reviews') + td").text.strip())
+        rating = soup.select_one(".star-rating")["class"][1]
+        image_url = soup.select_one("div.item.active img")["src"].replace("../../", self.base_url)
+
+        desc_el = soup.select_one("#product_description + p")
+        description = desc_el.text.strip() if desc_el else ""
+
+        return {
+            "title": title,
+            "description": description,
+            "category": category,
+            "price_incl_tax": float(price_incl),
+            "price_excl_tax": float(price_excl),
+            "availability": availability,
+            "num_reviews": num_reviews,
+            "rating": rating,
+            "image_url": image_url,
+        }
+
+    def parse_book_links(self, html: str) -> list[str]:
+        soup = BeautifulSoup(html, "html.parser")
+        return [a["href"] for a in soup.select("article.product_pod h3 a")]
+
+    def parse_total_pages(self, html: str) -> Optional[int]:
+        soup = BeautifulSoup(html, "html.parser")
+        pager = soup.select_one("li.current")
+        if pager:
+            return self.total_pages_from_pager(pager.text)
+        return None
+
+
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+class LxmlExtractor(BaseExtractor):
+    name = "lxml"
+
+    TITLE = f"//*[{_has_class('product_main')}]//h1"
+    AVAILABILITY = f"//*[{_has_class('availability')}]"
+    BREADCRUMB = f"//ul[{_has_class('breadcrumb')}]//li//a"
+    RATING = f"//*[{_has_class('star-rating')}]"
+    IMAGE = f"//div[{_has_class('item')} and {_has_class('active')}]//img"
+    DESCRIPTION = "//*[@id='product_description']/following-sibling::*[1][self::p]"
+    BOOK_LINKS = f"//article[{_has_class('product_pod')}]//h3//a/@href"
+    PAGER = f"//li[{_has_class('current')}]"
+
+    def parse_book(self, html: str) -> dict:
+        doc = lxml.html.document_fromstring(html)
+
+        # One pass over the product information table instead of a scan per field
+        info = {}
+        for row in doc.iter("tr"):
+            th = row.find("th")
+            td = row.find("td")
+            if th is not None and td is not None:
+                info[th.text_content().strip()] = td.text_content().strip()
+
+        title = doc.xpath(self.TITLE)[0].text_content().strip()
+        price_incl = info["Price (incl. tax)"].replace("£", "")
+        price_excl = info["Price (excl. tax)"].replace("£", "")
+        availability = doc.xpath(self.AVAILABILITY)[0].text_content().strip()
+        category = doc.xpath(self.BREADCRUMB)[-1].text_content().strip()
+        num_reviews = int(info["Number of reviews"])
+        rating = doc.xpath(self.RATING)[0].get("class").split()[1]
+        image_url = doc.xpath(self.IMAGE)[0].get("src").replace("../../", self.base_url)
+
+        desc_el = doc.xpath(self.DESCRIPTION)
+        description = desc_el[0].text_content().strip() if desc_el else ""
+
+        return {
+            "title": title,
+            "description": description,
+            "category": category,
+            "price_incl_tax": float(price_incl),
+            "price_excl_tax": float(price_excl),
+            "availability": availability,
+            "num_reviews": num_reviews,
+            "rating": rating,
+            "image_url": image_url,
+        }
+
+    def parse_book_links(self, html: str) -> list[str]:
+        doc = lxml.html.document_fromstring(html)
+        return [str(href) for href in doc.xpath(self.BOOK_LINKS)]
+
+    def parse_total_pages(self, html: str) -> Optional[int]:
+        doc = lxml.html.document_fromstring(html)
+        pager = doc.xpath(self.PAGER)
+        if pager:
+            return self.total_pages_from_pager(pager[0].text_content())
+        return None
+
+
+EXTRACTORS = {
+    SoupExtractor.name: SoupExtractor,
+    LxmlExtractor.name: LxmlExtractor,
+}
+
+
+def get_extractor(name: str = "lxml", base_url: str = BASE_URL) -> BaseExtractor:
+    if name == LxmlExtractor.name and lxml is None:
+        logger.warning("lxml is not installed, falling back to the bs4 extractor")
+        name = SoupExtractor.name
+    try:
+        return EXTRACTORS[name](base_url)
+    except KeyError:
+        raise ValueError(f"Unknown extractor '{name}', expected one of {list(EXTRACTORS)}")
+
+
+# Process pool support: each worker builds its extractor once in the
+# initializer, the parent only ships raw HTML in and plain dicts/lists out.
+_worker_extractor: Optional[BaseExtractor] = None
+
+
+def init_worker(name: str, base_url: str = BASE_URL):
+    global _worker_extractor
+    _worker_extractor = get_extractor(name, base_url)
+
+
+def run_extractor(method: str, html: str):
+    return getattr(_worker_extractor, method)(html)
+
+
+def check_parity(snapshot_dir: str) -> int:
+    """Run every backend over the saved snapshots and report pages whose BookSchema output differs."""
+    from datetime import datetime
+    from book.models import BookSchema
+    from services.snapshot_archive import iter_snapshots
+
+    reference = SoupExtractor()
+    candidates = [get_extractor(name) for name in EXTRACTORS if name != reference.name]
+    fixed = {
+        "source_url": "",
+        "content_hash": "",
+        "crawl_timestamp": datetime(2000, 1, 1),
+        "created_at": datetime(2000, 1, 1),
+    }
+
+    checked = mismatches = 0
+    for name, html in iter_snapshots(snapshot_dir):
+        try:
+            expected = BookSchema(**reference.parse_book(html), **fixed)
+        except Exception:
+            continue  # not a detail page the reference can parse
+        checked += 1
+        for extractor in candidates:
+            try:
+                actual = BookSchema(**extractor.parse_book(html), **fixed)
+            except Exception as e:
+                mismatches += 1
+                print(f"❌ {extractor.name} failed on {name}: {e!r}")
+                continue
+            if actual != expected:
+                mismatches += 1
+                diff = {
+                    key: (value, getattr(actual, key))
+                    for key, value in expected
+                    if getattr(actual, key) != value
+                }
+                print(f"❌ {extractor.name} differs on {name}: {diff}")
+    print(f"✅ Checked {checked} snapshots, {mismatches} mismatches")
+    return mismatches
+
+
+if __name__ == "__main__":
+    sys.exit(1 if check_parity(sys.argv[1] if len(sys.argv) > 1 else "./data/snapshots") else 0)
@@ -0,0 +1,139 @@
+"""
+Learned routing between the cheap HTTP tier and the browser tier.
+
+Outcomes of plain HTTP fetches are kept in sliding windows per proxy and per
+URL pattern. While either window shows a block rate above BLOCK_THRESHOLD a
+request goes straight to the browser, except that every PROBE_EVERY-th
+decision for that key still tries HTTP; a probe that gets through clears
+the key's history, so HTTP is used again as soon as blocking stops.
+
+Every list URL shares one pattern, so the pattern window only counts blocks
+the proxy does not already explain: a block through a proxy that is cooling
+down or whose previous fetch was blocked too lands in the proxy window only,
+and one bad proxy cannot send the healthy ones to the browser.
+"""
+import logging
+from collections import Counter, deque
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+from services.http_pool import proxy_url
+
+logger = logging.getLogger(__name__)
+
+HTTP = "http"
+BROWSER = "browser"
+
+
+def pattern_of(url: str) -> str:
+    """`https://www.ebay.com/sch/i.html?_nkw=x` -> `www.ebay.com/sch`."""
+    parts = urlsplit(url)
+    segment = parts.path.strip("/").split("/", 1)[0]
+    return f"{parts.netloc}/{segment}"
+
+
+def proxy_label(proxy: Any) -> str:
+    """host:port of a proxy, without credentials, for windows and metrics."""
+    url = proxy_url(proxy)
+    if url is None:
+        return "direct"
+    parts = urlsplit(url)
+    return f"{parts.hostname}:{parts.port}" if parts.port else parts.hostname or url
+
+
+class BlockWindow:
+    def __init__(self, size: int):
+        self.outcomes = deque(maxlen=size)
+
+    def add(self, blocked: bool):
+        self.outcomes.append(blocked)
+
+    def rate(self) -> Optional[float]:
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else None
+
+    def __len__(self):
+        return len(self.outcomes)
+
+
+class FetchRouter:
+    WINDOW = 50
+    MIN_SAMPLES = 5
+    BLOCK_THRESHOLD = 0.5
+    PROBE_EVERY = 10
+
+    def __init__(self, window: int = None, threshold: float = None, probe_every: int = None):
+        self.window = window or self.WINDOW
+        self.threshold = threshold or self.BLOCK_THRESHOLD
+        self.probe_every = probe_every or self.PROBE_EVERY
+        self.windows: dict[tuple[str, str], BlockWindow] = {}
+        self.skipped: Counter = Counter()  # HTTP attempts saved per key since the last probe
+        self.decisions = Counter()
+        self.failures = Counter()  # fetches without a response, per tier and pattern
+
+    def _window(self, kind: str, key: str) -> BlockWindow:
+        if (kind, key) not in self.windows:
+            self.windows[(kind, key)] = BlockWindow(self.window)
+        return self.windows[(kind, key)]
+
+    def _blocking(self, window: BlockWindow) -> bool:
+        return len(window) >= self.MIN_SAMPLES and window.rate() >= self.threshold
+
+    def choose(self, url: str, proxy: Any) -> str:
+        """The cheapest tier likely to succeed for `url` through `proxy`."""
+        if proxy is None:
+            self.decisions["browser_no_proxy"] += 1
+            return BROWSER
+
+        key = (proxy_label(proxy), pattern_of(url))
+        blocked = [
+            window for window in (self._window("proxy", key[0]), self._window("pattern", key[1]))
+            if self._blocking(window)
+        ]
+        if not blocked:
+            self.decisions[HTTP] += 1
+            return HTTP
+
+        self.skipped[key] += 1
+        if self.skipped[key] >= self.probe_every:
+            self.skipped[key] = 0
+            self.decisions["probe"] += 1
+            return HTTP
+        self.decisions[BROWSER] += 1
+        return BROWSER
+
+    def record(self, url: str, proxy: Any, tier: str, blocked: bool, proxy_cooling: bool = False):
+        """
+        The outcome of a fetch that got a response. `proxy_cooling` tells that
+        the proxy pool already has the proxy in cooldown for an earlier block.
+        """
+        if tier == HTTP:
+            proxy_window = self._window("proxy", proxy_label(proxy))
+            pattern_window = self._window("pattern", pattern_of(url))
+            windows = (proxy_window, pattern_window)
+            if not blocked and any(self._blocking(window) for window in windows):
+                # A probe got through: forget the blocked history instead of waiting for it to age out
+                self.decisions["probe_recovered"] += 1
+                for window in windows:
+                    window.outcomes.clear()
+            explained = blocked and (proxy_cooling or bool(proxy_window.outcomes and proxy_window.outcomes[-1]))
+            proxy_window.add(blocked)
+            if explained:
+                self.decisions["block_explained_by_proxy"] += 1
+            else:
+                pattern_window.add(blocked)
+        else:
+            self._window("browser", pattern_of(url)).add(blocked)
+
+    def record_failure(self, url: str, tier: str):
+        """A fetch that got no response at all; it says nothing about blocking, so only the metrics hear of it."""
+        self.failures[f"{tier} {pattern_of(url)}"] += 1
+
+    def metrics(self) -> dict:
+        stats = {}
+        for (kind, key), window in self.windows.items():
+            stats.setdefault(kind, {})[key] = {
+                "block_rate": round(window.rate(), 3) if len(window) else None,
+                "samples": len(window),
+                "routing_to_browser": kind != "browser" and self._blocking(window),
+            }
+        return {"decisions": dict(self.decisions), "failures": dict(self.failures), **stats}
@@ -0,0 +1,125 @@
+import socket
+import os
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from book.models import UrlRecordSchema
+from services.coordinator import shard_of
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlFrontier:
+    """
+    Persistent crawl frontier on top of the `url_record` collection.
+
+    Workers take urls with `lease()`, an atomic `find_one_and_update` that
+    stamps a lease expiry and bumps the attempt count, so any number of
+    coroutines or processes can pull from the same frontier without
+    fetching a url twice. A url stays pending until `complete()` flips its
+    status; if its worker dies the lease simply expires and another worker
+    picks it up, which is what makes a restarted run resume where the last
+    one stopped.
+    """
+    LEASE_SECONDS = 300
+    MAX_ATTEMPTS = 3
+
+    def __init__(
+        self,
+        db,
+        worker_id: str = None,
+        lease_seconds: int = None,
+        max_attempts: int = None,
+        buckets: int = None
+    ):
+        self.collection = db["url_record"]
+        # When set, every new record is tagged with its detail shard (see CrawlCoordinator)
+        self.buckets = buckets
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = lease_seconds or self.LEASE_SECONDS
+        self.max_attempts = max_attempts or self.MAX_ATTEMPTS
+
+    def _pending_query(self, type: Optional[str] = None, shard: Optional[int] = None) -> dict:
+        query = {"status": False, "attempts": {"$lt": self.max_attempts}}
+        if type:
+            query["type"] = type
+        if shard is not None:
+            query["shard"] = shard
+        return query
+
+    async def add(self, urls: List[str], type: str = "list", priority: int = 0, **fields) -> List[str]:
+        """Insert new records and return the urls that were not already in the frontier."""
+        records = [
+            UrlRecordSchema(
+                url=url,
+                type=type,
+                status=False,
+                priority=priority,
+                shard=shard_of(url, self.buckets) if self.buckets else None,
+                **fields
+            ).dict()
+            for url in urls
+        ]
+        if not records:
+            return []
+        try:
+            await self.collection.insert_many(records, ordered=False)
+            return list(urls)
+        except BulkWriteError as e:
+            duplicates = {error["index"] for error in e.details["writeErrors"]}
+            return [url for index, url in enumerate(urls) if index not in duplicates]
+
+    async def lease(self, type: str, limit: int = 1, query: dict = None) -> List[str]:
+        """Claim up to `limit` pending urls of `type`, highest priority first."""
+        urls = []
+        for _ in range(limit):
+            now = datetime.utcnow()
+            record = await self.collection.find_one_and_update(
+                {
+                    **self._pending_query(type),
+                    **(query or {}),
+                    "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}],
+                },
+                {
+                    "$set": {
+                        "lease_until": now + timedelta(seconds=self.lease_seconds),
+                        "leased_by": self.worker_id
+                    },
+                    "$inc": {"attempts": 1}
+                },
+                sort=[("priority", -1), ("timestamp", 1)],
+                projection={"url": 1},
+                return_document=ReturnDocument.AFTER
+            )
+            if record is None:
+                break
+            urls.append(record["url"])
+        return urls
+
+    async def complete(self, urls: List[str]):
+        await self.collection.update_many(
+            {"url": {"$in": urls}},
+            {"$set": {"status": True, "lease_until": None}}
+        )
+
+    async def release(self, url: str):
+        """Give a failed url back to the frontier; it is retried until MAX_ATTEMPTS."""
+        await self.collection.update_one(
+            {"url": url, "status": False, "leased_by": self.worker_id},
+            {"$set": {"lease_until": None}}
+        )
+
+    async def pending(self, type: Optional[str] = None, shard: Optional[int] = None) -> int:
+        return await self.collection.count_documents(self._pending_query(type, shard))
+
+    async def has_pending(self, type: Optional[str] = None, shard: Optional[int] = None, query: dict = None) -> bool:
+        return await self.collection.count_documents({**self._pending_query(type, shard), **(query or {})}, limit=1) > 0
+
+    async def reset(self):
+        """Drop the previous cycle once it has nothing left to do, including urls that ran out of attempts."""
+        result = await self.collection.delete_many({})
+        logger.info(f"Frontier reset: {result.deleted_count} records from the previous cycle removed")
@@ -0,0 +1,131 @@
+"""
+Price and availability history.
+
+Every crawl observation of a book (written or unchanged) is appended to the
+`price_history` time-series collection and folded, at write time, into two
+daily rollups with `$min` / `$max` / `$inc` upserts:
+
+    price_daily      one document per (source_url, day)
+    category_daily   one document per (category, day)
+
+so a 90 day trend is a range read of at most 90 small documents instead of
+a scan of `changelog`. Averages are `price_sum / samples`.
+"""
+import re
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import CollectionInvalid
+
+HISTORY_COLLECTION = "price_history"
+BOOK_DAILY_COLLECTION = "price_daily"
+CATEGORY_DAILY_COLLECTION = "category_daily"
+
+STOCK_PATTERN = re.compile(r"\((\d+) available\)")
+
+
+def stock_of(availability: Optional[str]) -> tuple[bool, Optional[int]]:
+    """`"In stock (22 available)"` -> `(True, 22)`."""
+    if not availability:
+        return False, None
+    match = STOCK_PATTERN.search(availability)
+    return availability.lower().startswith("in stock"), int(match.group(1)) if match else None
+
+
+def day_of(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def observation(book: dict, observed_at: datetime) -> dict:
+    in_stock, stock = stock_of(book.get("availability"))
+    return {
+        "ts": observed_at,
+        "meta": {"source_url": book["source_url"], "category": book.get("category")},
+        "price_incl_tax": book.get("price_incl_tax"),
+        "price_excl_tax": book.get("price_excl_tax"),
+        "availability": book.get("availability"),
+        "in_stock": in_stock,
+        "stock": stock,
+    }
+
+
+def rollup(key: dict, obs: dict) -> UpdateOne:
+    price = obs["price_incl_tax"]
+    return UpdateOne(
+        key,
+        {
+            "$min": {"price_min": price},
+            "$max": {"price_max": price},
+            "$inc": {"price_sum": price, "samples": 1, "in_stock_samples": int(obs["in_stock"])},
+            "$set": {
+                "last_price": price,
+                "last_price_excl_tax": obs["price_excl_tax"],
+                "last_availability": obs["availability"],
+                "updated_at": obs["ts"],
+            },
+        },
+        upsert=True
+    )
+
+
+async def record_observations(db, books: Iterable[dict], observed_at: datetime = None):
+    """Append one observation per book and update both daily rollups, three round trips per batch."""
+    observed_at = observed_at or datetime.utcnow()
+    day = day_of(observed_at)
+    observations = [observation(book, observed_at) for book in books if book.get("price_incl_tax") is not None]
+    if not observations:
+        return
+
+    await db[HISTORY_COLLECTION].insert_many(observations, ordered=False)
+    await db[BOOK_DAILY_COLLECTION].bulk_write([
+        rollup({"source_url": obs["meta"]["source_url"], "day": day}, obs) for obs in observations
+    ], ordered=False)
+    by_category = [
+        rollup({"category": obs["meta"]["category"], "day": day}, obs)
+        for obs in observations if obs["meta"]["category"]
+    ]
+    if by_category:
+        await db[CATEGORY_DAILY_COLLECTION].bulk_write(by_category, ordered=False)
+
+
+def _summary(doc: dict) -> dict:
+    return {
+        "day": doc["day"],
+        "min": doc["price_min"],
+        "max": doc["price_max"],
+        "avg": round(doc["price_sum"] / doc["samples"], 2),
+        "last": doc["last_price"],
+        "in_stock_ratio": round(doc["in_stock_samples"] / doc["samples"], 3),
+        "samples": doc["samples"],
+    }
+
+
+async def book_history(db, source_url: str, days: int = 90) -> list[dict]:
+    since = day_of(datetime.utcnow()) - timedelta(days=days)
+    cursor = db[BOOK_DAILY_COLLECTION].find(
+        {"source_url": source_url, "day": {"$gte": since}}
+    ).sort("day", 1)
+    return [{**_summary(doc), "availability": doc["last_availability"]} async for doc in cursor]
+
+
+async def category_stats(db, category: str, days: int = 90) -> list[dict]:
+    since = day_of(datetime.utcnow()) - timedelta(days=days)
+    cursor = db[CATEGORY_DAILY_COLLECTION].find(
+        {"category": category, "day": {"$gte": since}}
+    ).sort("day", 1)
+    return [_summary(doc) async for doc in cursor]
+
+
+async def create_collections(db):
+    try:
+        await db.create_collection(
+            HISTORY_COLLECTION,
+            timeseries={"timeField": "ts", "metaField": "meta", "granularity": "hours"}
+        )
+        print(f"✅ Time-series collection {HISTORY_COLLECTION} created")
+    except CollectionInvalid:
+        pass
+    await db[BOOK_DAILY_COLLECTION].create_index([("source_url", 1), ("day", 1)], unique=True)
+    await db[CATEGORY_DAILY_COLLECTION].create_index([("category", 1), ("day", 1)], unique=True)
+    print(f"✅ Rollup indexes on {BOOK_DAILY_COLLECTION} and {CATEGORY_DAILY_COLLECTION} applied")
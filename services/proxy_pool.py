@@ -0,0 +1,169 @@
+"""
+Proxy pool with health scoring and cooldowns.
+
+Every proxy serves up to MAX_IN_FLIGHT requests at once and each request
+goes to the available proxy with the best score: its smoothed success rate
+over its latency EWMA, discounted by the requests it already carries. A
+blocked proxy is put in cooldown (doubling per consecutive block, capped)
+instead of being dropped, and repeated transport errors cool it briefly.
+"""
+import asyncio
+import time
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Iterable, Optional
+
+from services.fetch_router import proxy_label
+from services.throttle import ERROR, OK
+
+logger = logging.getLogger(__name__)
+
+BLOCKED = "blocked"
+
+
+class ProxyState:
+    LATENCY_ALPHA = 0.2
+
+    def __init__(self, proxy: Any):
+        self.proxy = proxy
+        self.label = proxy_label(proxy)
+        self.in_flight = 0
+        self.counts = {OK: 0, ERROR: 0, BLOCKED: 0}
+        self.latency: Optional[float] = None
+        self.consecutive_blocks = 0
+        self.consecutive_errors = 0
+        self.cooldown_until = 0.0
+
+    def success_rate(self) -> float:
+        # Laplace smoothing, so a fresh proxy starts at 0.5 instead of 0 or 1
+        return (self.counts[OK] + 1) / (sum(self.counts.values()) + 2)
+
+    def score(self) -> float:
+        return self.success_rate() / (self.latency or 1.0) / (1 + self.in_flight)
+
+    def cooling_for(self, now: float) -> float:
+        return max(0.0, self.cooldown_until - now)
+
+    def record(self, outcome: str, latency: Optional[float]):
+        self.counts[outcome] += 1
+        if latency is not None:
+            self.latency = latency if self.latency is None else (
+                self.LATENCY_ALPHA * latency + (1 - self.LATENCY_ALPHA) * self.latency
+            )
+        self.consecutive_blocks = self.consecutive_blocks + 1 if outcome == BLOCKED else 0
+        self.consecutive_errors = self.consecutive_errors + 1 if outcome == ERROR else 0
+
+    def snapshot(self, now: float) -> dict:
+        return {
+            "proxy": self.label,
+            "in_flight": self.in_flight,
+            **self.counts,
+            "success_rate": round(self.success_rate(), 3),
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "score": round(self.score(), 3),
+            "cooling_for": round(self.cooling_for(now), 1),
+        }
+
+
+class ProxyLease:
+    """One request's hold on a proxy; set `outcome` to BLOCKED or ERROR when it did not go well."""
+
+    def __init__(self, state: ProxyState):
+        self.state = state
+        self.proxy = state.proxy
+        self.outcome = OK
+        self.started = time.perf_counter()
+
+
+class ProxyPool:
+    MAX_IN_FLIGHT = 4  # requests per proxy at once
+    BLOCK_COOLDOWN = 60  # seconds after the first block, doubled per consecutive block
+    MAX_COOLDOWN = 900
+    ERROR_COOLDOWN = 10  # seconds after MAX_CONSECUTIVE_ERRORS transport errors in a row
+    MAX_CONSECUTIVE_ERRORS = 3
+
+    def __init__(self, proxies: Iterable[Any], max_in_flight: int = None, block_cooldown: float = None):
+        self.states = [ProxyState(proxy) for proxy in proxies]
+        self.max_in_flight = max_in_flight or self.MAX_IN_FLIGHT
+        self.block_cooldown = block_cooldown or self.BLOCK_COOLDOWN
+        self.cond: Optional[asyncio.Condition] = None
+
+    def __len__(self):
+        return len(self.states)
+
+    def _condition(self) -> asyncio.Condition:
+        # Created lazily so the pool can be built outside the event loop that uses it
+        if self.cond is None:
+            self.cond = asyncio.Condition()
+        return self.cond
+
+    def _pick(self, now: float) -> tuple[Optional[ProxyState], bool]:
+        """Best available proxy, and whether any proxy is out of cooldown at all."""
+        warm = [state for state in self.states if not state.cooling_for(now)]
+        free = [state for state in warm if state.in_flight < self.max_in_flight]
+        return (max(free, key=ProxyState.score) if free else None), bool(warm)
+
+    async def acquire(self) -> Optional[ProxyLease]:
+        """
+        A lease on the best proxy, waiting while every warm proxy is at capacity.
+        Returns None when there are no proxies or all of them are cooling down.
+        """
+        cond = self._condition()
+        async with cond:
+            while True:
+                state, any_warm = self._pick(time.monotonic())
+                if state:
+                    state.in_flight += 1
+                    return ProxyLease(state)
+                if not any_warm:
+                    return None
+                await cond.wait()
+
+    async def release(self, lease: Optional[ProxyLease], outcome: Optional[str] = None):
+        """Return a lease; `outcome` (default `lease.outcome`) feeds the score, None records nothing."""
+        if lease is None:
+            return
+        state = lease.state
+        outcome = lease.outcome if outcome is None else outcome
+        async with self._condition():
+            state.in_flight -= 1
+            if outcome == BLOCKED and state.cooling_for(time.monotonic()):
+                # Sent before the cooldown started, the block is already being served
+                state.counts[BLOCKED] += 1
+            elif outcome:
+                state.record(outcome, time.perf_counter() - lease.started if outcome == OK else None)
+                self._cool_down(state, outcome)
+            self.cond.notify_all()
+
+    def _cool_down(self, state: ProxyState, outcome: str):
+        if outcome == BLOCKED:
+            seconds = min(self.MAX_COOLDOWN, self.block_cooldown * 2 ** (state.consecutive_blocks - 1))
+        elif outcome == ERROR and state.consecutive_errors >= self.MAX_CONSECUTIVE_ERRORS:
+            seconds = self.ERROR_COOLDOWN
+        else:
+            return
+        state.cooldown_until = time.monotonic() + seconds
+        logger.warning(f"Proxy {state.label} cooling down for {seconds:.0f}s after {outcome}")
+
+    @asynccontextmanager
+    async def lease(self):
+        """`async with pool.lease() as lease:`; an exception counts as ERROR, `lease` is None without a proxy."""
+        lease = await self.acquire()
+        try:
+            yield lease
+        except Exception:
+            if lease:
+                lease.outcome = ERROR
+            raise
+        finally:
+            await self.release(lease)
+
+    def state(self) -> dict:
+        now = time.monotonic()
+        proxies = [state.snapshot(now) for state in self.states]
+        return {
+            "proxies": len(proxies),
+            "available": sum(1 for state in self.states if not state.cooling_for(now)),
+            "in_flight": sum(state.in_flight for state in self.states),
+            "pool": sorted(proxies, key=lambda proxy: -proxy["score"]),
+        }
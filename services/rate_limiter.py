@@ -1,24 +1,117 @@
+"""
+Per API key rate limiting with GCRA (generic cell rate algorithm).
+
+Each key keeps a single number, its theoretical arrival time (TAT). Requests
+are spaced `interval = window / limit` seconds apart and may run ahead of
+schedule by at most `burst` requests, so unlike a fixed window there is no
+2x burst at the window edge.
+
+Backends:
+    MemoryBackend  per process, bounded LRU over keys
+    MongoBackend   shared by every worker; one atomic `find_one_and_update`
+                   (pipeline update) per request on the `rate_limit` collection
+"""
+import math
 import time
-from fastapi import HTTPException, status
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+from fastapi import Depends, HTTPException, Response, status
+from pymongo import ReturnDocument
+
 from config import settings
+from services.auth import verify_api_key
+
+RATE_LIMIT_COLLECTION = "rate_limit"
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    remaining: int
+    retry_after: float
+
+
+class RateLimitBackend:
+    async def hit(self, key: str, now: float, interval: float, tolerance: float) -> tuple[bool, float]:
+        """Atomically apply one request to `key`; returns (allowed, TAT afterwards)."""
+        raise NotImplementedError
+
+
+class MemoryBackend(RateLimitBackend):
+    MAX_KEYS = 10000
 
-rate_limit_cache = {}
+    def __init__(self, max_keys: int = None):
+        self.max_keys = max_keys or self.MAX_KEYS
+        self.tats: OrderedDict[str, float] = OrderedDict()
 
-async def rate_limit(api_key: str):
-    limit = settings.RATE_LIMIT
-    window = 3600  # 1 hour
+    async def hit(self, key: str, now: float, interval: float, tolerance: float) -> tuple[bool, float]:
+        # No await between read and write, so this is atomic on the event loop
+        base = max(self.tats.get(key, now), now)
+        allowed = base - now <= tolerance
+        if allowed:
+            self.tats[key] = base + interval
+            self.tats.move_to_end(key)
+            while len(self.tats) > self.max_keys:
+                self.tats.popitem(last=False)
+        return allowed, self.tats.get(key, now)
 
-    current_time = int(time.time())
-    user_data = rate_limit_cache.get(api_key, {"count": 0, "start": current_time})
 
-    if current_time - user_data["start"] > window:
-        user_data = {"count": 0, "start": current_time}
+class MongoBackend(RateLimitBackend):
+    def __init__(self, db):
+        self.db = db
 
-    if user_data["count"] >= limit:
+    async def hit(self, key: str, now: float, interval: float, tolerance: float) -> tuple[bool, float]:
+        base = {"$max": [{"$ifNull": ["$tat", now]}, now]}
+        doc = await self.db[RATE_LIMIT_COLLECTION].find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"allowed": {"$lte": [{"$subtract": [base, now]}, tolerance]}}},
+                {"$set": {
+                    "tat": {"$cond": ["$allowed", {"$add": [base, interval]}, "$tat"]},
+                    # Idle keys are removed by the TTL index once their TAT is in the past
+                    "expires_at": datetime.fromtimestamp(now + tolerance + interval, timezone.utc),
+                }},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc["allowed"], doc["tat"]
+
+
+class RateLimiter:
+    def __init__(self, limit: int, window: float, burst: int, backend: RateLimitBackend = None):
+        self.limit = limit
+        self.interval = window / limit
+        self.burst = burst
+        self.tolerance = self.interval * (burst - 1)
+        self.backend = backend or MemoryBackend()
+
+    async def hit(self, key: str, now: Optional[float] = None) -> Decision:
+        now = time.time() if now is None else now
+        allowed, tat = await self.backend.hit(key, now, self.interval, self.tolerance)
+        if not allowed:
+            return Decision(False, 0, max(0.0, tat - self.tolerance - now))
+        remaining = math.floor((self.tolerance - (tat - now)) / self.interval) + 1
+        return Decision(True, max(0, remaining), 0.0)
+
+
+rate_limiter = RateLimiter(settings.RATE_LIMIT, settings.RATE_LIMIT_WINDOW, settings.RATE_LIMIT_BURST)
+
+
+def use_rate_limit_backend(db):
+    """Share the limiter state between workers once the database is connected (RATE_LIMIT_BACKEND=mongo)."""
+    if settings.RATE_LIMIT_BACKEND == "mongo":
+        rate_limiter.backend = MongoBackend(db)
+
+
+async def rate_limit(response: Response, api_key: str = Depends(verify_api_key)):
+    decision = await rate_limiter.hit(api_key)
+    if not decision.allowed:
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Rate limit exceeded. Try again later."
+            detail="Rate limit exceeded. Try again later.",
+            headers={"Retry-After": str(math.ceil(decision.retry_after))}
         )
-
-    user_data["count"] += 1
-    rate_limit_cache[api_key] = user_data
+    response.headers["X-RateLimit-Limit"] = str(rate_limiter.limit)
+    response.headers["X-RateLimit-Remaining"] = str(decision.remaining)
@@ -0,0 +1,73 @@
+"""
+Sliding-window scheduler: a fixed number of slots pull work from one queue.
+
+A slot starts its next item as soon as its current one finishes, so a slow
+request only holds its own slot instead of the whole batch, and every result
+is handed back together with the item that produced it.
+"""
+import asyncio
+import inspect
+import time
+import logging
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SlidingWindowScheduler:
+    def __init__(self, slots: int):
+        self.slots = slots
+        self.busy = [0.0] * slots
+        self.completed = [0] * slots
+        self.errors = 0
+        self.elapsed = 0.0
+
+    async def run(
+        self,
+        items: Iterable[Any],
+        handler: Callable[[Any], Awaitable[Any]],
+        on_result: Optional[Callable[[Any, Any], Any]] = None
+    ):
+        """
+        Run `handler(item)` for every item with at most `slots` in flight and
+        call `on_result(item, result)` as each one finishes (sync or async).
+        A failing item is logged and counted; its slot moves on.
+        """
+        queue = asyncio.Queue()
+        for item in items:
+            queue.put_nowait(item)
+
+        async def slot(index: int):
+            while True:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                started = time.perf_counter()
+                try:
+                    result = await handler(item)
+                    if on_result:
+                        outcome = on_result(item, result)
+                        if inspect.isawaitable(outcome):
+                            await outcome
+                    self.completed[index] += 1
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning(f"Scheduler slot {index} failed on {item}: {e!r}")
+                finally:
+                    self.busy[index] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        await asyncio.gather(*(slot(index) for index in range(self.slots)))
+        self.elapsed += time.perf_counter() - started
+
+    def metrics(self) -> dict:
+        utilization = [round(busy / self.elapsed, 3) if self.elapsed else 0.0 for busy in self.busy]
+        return {
+            "slots": self.slots,
+            "completed": sum(self.completed),
+            "errors": self.errors,
+            "elapsed": round(self.elapsed, 2),
+            "utilization": round(sum(utilization) / self.slots, 3),
+            "slot_utilization": utilization,
+        }
@@ -0,0 +1,347 @@
+"""
+Packed, append-only archive for raw HTML snapshots.
+
+Snapshots are appended to segment files (`segment-000001.pack`, ...) as
+length-prefixed records:
+
+    MAGIC (4 bytes) | header length (uint32) | payload length (uint32) | header (JSON) | payload (compressed HTML)
+
+`index.jsonl` maps every content_hash to its segment, offset and length.
+Readers `mmap` the segments, so random access by content_hash or source_url
+is a slice of the mapped file and a sequential scan never opens a file per
+snapshot.
+
+Appends hold an exclusive `flock` on `archive.lock`, so several processes
+(e.g. distributed workers) can share one archive: each writer first reads
+the index entries the others appended, then takes its offset under the lock.
+
+Loose snapshot files referenced by the `book` collection can be moved in with:
+
+    python -m services.snapshot_archive migrate --archive ./data/archive [--delete]
+"""
+import argparse
+import asyncio
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from services.snapshot_store import (
+    compress,
+    compression_of,
+    decompress,
+    read_snapshot,
+    zstandard
+)
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"BKS1"
+RECORD_HEADER = struct.Struct(">4sII")
+REF_PREFIX = "pack:"
+
+
+def is_archive_ref(raw_html_path: Optional[str]) -> bool:
+    return bool(raw_html_path) and raw_html_path.startswith(REF_PREFIX)
+
+
+class SnapshotArchive:
+    SEGMENT_SIZE = 256 * 1024 * 1024  # bytes before rolling over to a new segment
+
+    def __init__(self, root: str = "./data/archive", compression: str = None, segment_size: int = None):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.root / "index.jsonl"
+        self.lock_path = self.root / "archive.lock"
+        self.compression = compression or ("zstd" if zstandard else "gzip")
+        self.segment_size = segment_size or self.SEGMENT_SIZE
+        self.lock = threading.Lock()
+        self.by_hash: dict[str, dict] = {}
+        self.by_url: dict[str, list[str]] = {}
+        self.maps: dict[str, mmap.mmap] = {}
+        self.index_position = 0  # bytes of index.jsonl already loaded
+        self.stats = {"writes": 0, "skipped": 0, "bytes_raw": 0, "bytes_stored": 0}
+        self._load_index()
+
+    # -- writing -------------------------------------------------------
+
+    def _segments(self) -> list[Path]:
+        return sorted(self.root.glob("segment-*.pack"))
+
+    def _current_segment(self) -> Path:
+        segments = self._segments()
+        if segments and segments[-1].stat().st_size < self.segment_size:
+            return segments[-1]
+        return self.root / f"segment-{len(segments) + 1:06d}.pack"
+
+    @contextmanager
+    def _exclusive(self):
+        """Serialize writers across threads (`lock`) and processes (`flock`)."""
+        with self.lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append(self, source_url: str, content_hash: str, html: str) -> str:
+        """Append a snapshot unless its hash is already archived; returns its `pack:` reference."""
+        with self._exclusive():
+            # Other processes may have archived this hash since our last look
+            self._load_index()
+            if content_hash in self.by_hash:
+                self._remember_url(source_url, content_hash)
+                self.stats["skipped"] += 1
+                return self.ref(content_hash)
+
+            payload = compress(html, self.compression)
+            header = json.dumps({
+                "source_url": source_url,
+                "content_hash": content_hash,
+                "compression": self.compression,
+                "stored_at": time.time()
+            }).encode("utf-8")
+            segment = self._current_segment()
+            with open(segment, "ab") as f:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(RECORD_HEADER.pack(MAGIC, len(header), len(payload)))
+                f.write(header)
+                f.write(payload)
+            # The segment grew, drop the stale mapping so the next read maps the new length.
+            # Readers may still hold views into it, so it is left to close when released.
+            self.maps.pop(segment.name, None)
+
+            entry = {
+                "source_url": source_url,
+                "content_hash": content_hash,
+                "segment": segment.name,
+                "offset": offset,
+                "header_length": len(header),
+                "length": len(payload),
+                "compression": self.compression
+            }
+            with open(self.index_path, "ab") as f:
+                f.write(json.dumps(entry).encode("utf-8") + b"\n")
+                self.index_position = f.tell()
+            self._add_to_index(entry)
+
+            self.stats["writes"] += 1
+            self.stats["bytes_raw"] += len(html.encode("utf-8"))
+            self.stats["bytes_stored"] += len(payload)
+            return self.ref(content_hash)
+
+    async def put(self, source_url: str, content_hash: str, html: str) -> str:
+        """Same interface as SnapshotStore.put, the append runs in a thread."""
+        return await asyncio.to_thread(self.append, source_url, content_hash, html)
+
+    @staticmethod
+    def ref(content_hash: str) -> str:
+        return f"{REF_PREFIX}{content_hash}"
+
+    # -- index ---------------------------------------------------------
+
+    def _add_to_index(self, entry: dict):
+        self.by_hash[entry["content_hash"]] = entry
+        self._remember_url(entry["source_url"], entry["content_hash"])
+
+    def _remember_url(self, source_url: str, content_hash: str):
+        hashes = self.by_url.setdefault(source_url, [])
+        if content_hash not in hashes:
+            hashes.append(content_hash)
+
+    def _load_index(self):
+        """Load the index entries appended since the last call, by this or any other process."""
+        if not self.index_path.exists():
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self.index_position)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # a writer is still appending this line
+                self.index_position += len(line)
+                if line.strip():
+                    self._add_to_index(json.loads(line))
+
+    def rebuild_index(self):
+        """Recreate index.jsonl from the segments, e.g. after losing it."""
+        with self._exclusive():
+            self.by_hash, self.by_url = {}, {}
+            with open(self.index_path, "wb") as f:
+                for entry in self._scan():
+                    f.write(json.dumps(entry).encode("utf-8") + b"\n")
+                    self._add_to_index(entry)
+                self.index_position = f.tell()
+
+    # -- reading -------------------------------------------------------
+
+    def _map(self, segment: str, end: int = 0) -> mmap.mmap:
+        """A read-only mapping of `segment` covering at least `end` bytes."""
+        mapped = self.maps.get(segment)
+        if mapped is not None and len(mapped) < end:
+            # Mapped before another instance appended to the segment; like append(), leave it to close when released
+            mapped = None
+        if mapped is None:
+            with open(self.root / segment, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.maps[segment] = mapped
+        return mapped
+
+    def _payload(self, entry: dict) -> memoryview:
+        start = entry["offset"] + RECORD_HEADER.size + entry["header_length"]
+        end = start + entry["length"]
+        return memoryview(self._map(entry["segment"], end))[start:end]
+
+    def get(self, content_hash: str) -> Optional[str]:
+        entry = self.by_hash.get(content_hash)
+        if entry is None:
+            self._load_index()
+            entry = self.by_hash.get(content_hash)
+        if entry is None:
+            return None
+        return decompress(self._payload(entry), entry["compression"])
+
+    def get_by_url(self, source_url: str) -> Optional[str]:
+        """Latest archived version of a page."""
+        hashes = self.by_url.get(source_url)
+        return self.get(hashes[-1]) if hashes else None
+
+    def versions(self, source_url: str) -> list[str]:
+        return list(self.by_url.get(source_url, []))
+
+    def _scan(self) -> Iterator[dict]:
+        for segment in self._segments():
+            mapped = self._map(segment.name)
+            offset = 0
+            while offset + RECORD_HEADER.size <= len(mapped):
+                magic, header_length, length = RECORD_HEADER.unpack_from(mapped, offset)
+                if magic != MAGIC:
+                    logger.warning(f"Corrupt record in {segment.name} at {offset}, skipping the rest of the segment")
+                    break
+                header_start = offset + RECORD_HEADER.size
+                header = json.loads(bytes(mapped[header_start:header_start + header_length]))
+                yield {
+                    **header,
+                    "segment": segment.name,
+                    "offset": offset,
+                    "header_length": header_length,
+                    "length": length,
+                }
+                offset = header_start + header_length + length
+
+    def iter_records(self) -> Iterator[tuple[dict, str]]:
+        """Sequential scan of every archived snapshot in write order, for batch reprocessing."""
+        for entry in self._scan():
+            yield entry, decompress(self._payload(entry), entry["compression"])
+
+    def close(self):
+        for mapped in self.maps.values():
+            mapped.close()
+        self.maps = {}
+
+    def metrics(self) -> dict:
+        return {
+            **self.stats,
+            "compression": self.compression,
+            "segments": len(self._segments()),
+            "snapshots": len(self.by_hash),
+        }
+
+    def disk_usage(self) -> int:
+        return sum(segment.stat().st_size for segment in self._segments())
+
+
+def iter_snapshots(root: str) -> Iterator[tuple[str, str]]:
+    """
+    `(name, html)` of every snapshot under `root`, whatever wrote it: legacy
+    loose `.html` files, SnapshotStore objects (`objects/<xx>/<hash>.html.gz`)
+    and SnapshotArchive segments.
+    """
+    root = Path(root)
+    for path in sorted(root.glob("*.html")):
+        yield path.name, read_snapshot(str(path))
+    for path in sorted((root / "objects").glob("*/*.html.*")):
+        if compression_of(str(path)):
+            yield path.name, read_snapshot(str(path))
+    if any(root.glob("segment-*.pack")):
+        archive = SnapshotArchive(str(root))
+        try:
+            for entry, html in archive.iter_records():
+                yield f"{entry['segment']}@{entry['offset']}", html
+        finally:
+            archive.close()
+
+
+async def migrate(archive_dir: str, delete: bool = False):
+    """Move every snapshot file referenced by `book.raw_html_path` into the archive."""
+    from pymongo import UpdateOne
+    from database import mongo_instance
+
+    await mongo_instance.connect()
+    db = mongo_instance.db
+    archive = SnapshotArchive(archive_dir)
+    operations, migrated, missing, mismatched = [], 0, 0, 0
+    moved_files, kept_files = set(), set()
+
+    query = {"raw_html_path": {"$exists": True, "$ne": None, "$not": {"$regex": f"^{REF_PREFIX}"}}}
+    async for book in db["book"].find(query, {"source_url": 1, "raw_html_path": 1, "content_hash": 1}):
+        path = book["raw_html_path"]
+        if not os.path.exists(path):
+            missing += 1
+            continue
+        html = await asyncio.to_thread(read_snapshot, path)
+        # Loose files were keyed by title and may hold another book's page; leave those books unmigrated
+        if hashlib.md5(html.encode("utf-8")).hexdigest() != book["content_hash"]:
+            logger.warning(f"{path} does not match the stored content_hash of {book['source_url']}, skipped")
+            mismatched += 1
+            kept_files.add(path)
+            continue
+        ref = await archive.put(book["source_url"], book["content_hash"], html)
+        operations.append(UpdateOne({"_id": book["_id"]}, {"$set": {"raw_html_path": ref}}))
+        moved_files.add(path)
+        migrated += 1
+        if len(operations) >= 500:
+            await db["book"].bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        await db["book"].bulk_write(operations, ordered=False)
+
+    if delete:
+        # A file another (mismatched) book still points at stays where it is
+        for path in moved_files - kept_files:
+            os.remove(path)
+    archive.close()
+    await mongo_instance.close()
+    print(
+        f"✅ Migrated {migrated} snapshots into {archive_dir} "
+        f"({missing} missing files, {mismatched} not matching their book), {archive.metrics()}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Packed snapshot archive")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="move loose snapshot files into the archive")
+    migrate_parser.add_argument("--archive", default="./data/archive")
+    migrate_parser.add_argument("--delete", action="store_true", help="remove the loose files afterwards")
+    rebuild_parser = subparsers.add_parser("rebuild-index", help="recreate index.jsonl from the segments")
+    rebuild_parser.add_argument("--archive", default="./data/archive")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        asyncio.run(migrate(args.archive, args.delete))
+    else:
+        archive = SnapshotArchive(args.archive)
+        archive.rebuild_index()
+        print(f"✅ Index rebuilt: {archive.metrics()}")
+
+
+if __name__ == "__main__":
+    main()
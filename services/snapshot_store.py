@@ -0,0 +1,161 @@
+import asyncio
+import gzip
+import json
+import os
+import time
+import uuid
+import logging
+from collections import deque
+from pathlib import Path
+from typing import Optional
+
+import aiofiles
+import aiofiles.os
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, gzip is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {"gzip": ".html.gz", "zstd": ".html.zst"}
+
+
+def compress(html: str, compression: str) -> bytes:
+    data = html.encode("utf-8")
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress(data: bytes, compression: str) -> str:
+    if compression == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    if compression == "gzip":
+        return gzip.decompress(data).decode("utf-8")
+    return data.decode("utf-8")
+
+
+def compression_of(path: str) -> Optional[str]:
+    for compression, extension in EXTENSIONS.items():
+        if path.endswith(extension):
+            return compression
+    return None
+
+
+def read_snapshot(path: str) -> str:
+    """Read any stored snapshot: a store object (.html.gz / .html.zst) or a legacy loose .html file."""
+    with open(path, "rb") as f:
+        return decompress(f.read(), compression_of(path))
+
+
+class SnapshotStore:
+    """
+    Content-addressed store for raw HTML.
+
+    Snapshots live at `objects/<hash[:2]>/<hash>.html.gz` (or `.zst` when
+    zstandard is installed), so a page is written once per distinct content
+    and two books with the same title can no longer overwrite each other.
+    Compression runs in a worker thread and files are written through
+    aiofiles, keeping disk I/O off the event loop. `index.jsonl` records
+    every `(source_url, content_hash)` version that was stored, once: puts of
+    a hash already being written wait for that write, and across processes
+    only the put whose object lands first appends the index line.
+    """
+
+    def __init__(self, root: str = "./data/snapshots", compression: str = None):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.index_path = self.root / "index.jsonl"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.compression = compression or ("zstd" if zstandard else "gzip")
+        if self.compression == "zstd" and zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        self.index_lock = asyncio.Lock()
+        self.in_flight: dict[str, asyncio.Future] = {}  # content_hash -> the put writing it
+        self.stats = {"writes": 0, "skipped": 0, "bytes_raw": 0, "bytes_stored": 0}
+        self.latencies = deque(maxlen=1000)
+
+    def path_for(self, content_hash: str) -> Path:
+        return self.objects / content_hash[:2] / f"{content_hash}{EXTENSIONS[self.compression]}"
+
+    async def put(self, source_url: str, content_hash: str, html: str) -> str:
+        """Store `html` under its hash unless already present and return the object path."""
+        path = self.path_for(content_hash)
+        # Wait for a put of the same hash, then find its object (or write it, if that put failed)
+        while content_hash in self.in_flight:
+            await asyncio.shield(self.in_flight[content_hash])
+        writing = self.in_flight[content_hash] = asyncio.get_running_loop().create_future()
+        try:
+            if await aiofiles.os.path.exists(path):
+                self.stats["skipped"] += 1
+            else:
+                await self._write(source_url, content_hash, html, path)
+        finally:
+            del self.in_flight[content_hash]
+            writing.set_result(None)
+        return str(path)
+
+    async def _write(self, source_url: str, content_hash: str, html: str, path: Path):
+        started = time.perf_counter()
+        data = await asyncio.to_thread(compress, html, self.compression)
+        await aiofiles.os.makedirs(path.parent, exist_ok=True)
+        # Write then link so a crash never leaves a truncated object behind. The temp
+        # name is unique per put and link() fails if the object exists, so of several
+        # processes storing the same hash only the first one writes the index line.
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        async with aiofiles.open(tmp_path, "wb") as f:
+            await f.write(data)
+        try:
+            await asyncio.to_thread(os.link, tmp_path, path)
+        except FileExistsError:
+            self.stats["skipped"] += 1
+            return
+        finally:
+            await aiofiles.os.remove(tmp_path)
+        await self._append_index(source_url, content_hash, path)
+
+        self.latencies.append(time.perf_counter() - started)
+        self.stats["writes"] += 1
+        self.stats["bytes_raw"] += len(html.encode("utf-8"))
+        self.stats["bytes_stored"] += len(data)
+
+    async def get(self, content_hash: str) -> Optional[str]:
+        path = self.path_for(content_hash)
+        if not await aiofiles.os.path.exists(path):
+            return None
+        async with aiofiles.open(path, "rb") as f:
+            data = await f.read()
+        return await asyncio.to_thread(decompress, data, self.compression)
+
+    async def _append_index(self, source_url: str, content_hash: str, path: Path):
+        line = json.dumps({
+            "source_url": source_url,
+            "content_hash": content_hash,
+            "path": str(path),
+            "stored_at": time.time()
+        })
+        async with self.index_lock:
+            async with aiofiles.open(self.index_path, "a", encoding="utf-8") as f:
+                await f.write(line + "\n")
+
+    def versions(self, source_url: str) -> list[dict]:
+        """Every stored version of a page, oldest first."""
+        if not self.index_path.exists():
+            return []
+        with open(self.index_path, encoding="utf-8") as f:
+            return [entry for entry in map(json.loads, f) if entry["source_url"] == source_url]
+
+    def disk_usage(self) -> int:
+        return sum(path.stat().st_size for path in self.objects.rglob("*") if path.is_file())
+
+    def metrics(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            **self.stats,
+            "compression": self.compression,
+            "ratio": round(self.stats["bytes_stored"] / self.stats["bytes_raw"], 3) if self.stats["bytes_raw"] else None,
+            "write_p50_ms": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+            "write_p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 2) if latencies else None,
+        }
@@ -0,0 +1,134 @@
+import asyncio
+import time
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Outcomes reported back to the limiter after every request
+OK = "ok"
+THROTTLED = "throttled"  # 429 / 503, usually with Retry-After
+ERROR = "error"          # timeouts, connection errors, other 5xx
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for one host.
+
+    Every healthy response grows the limit by `1 / limit` (about +1 per round
+    of requests) while p95 latency stays under `target_p95` and the error rate
+    under MAX_ERROR_RATE. A throttled or failed request halves it, at most
+    once per DECREASE_INTERVAL, and a Retry-After pauses the host entirely.
+    """
+    WINDOW = 100
+    DECREASE_FACTOR = 0.5
+    DECREASE_INTERVAL = 1.0  # seconds
+    MAX_ERROR_RATE = 0.05
+
+    def __init__(
+        self,
+        initial: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        target_p95: float = 2.0,
+        window: int = None
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_p95 = target_p95
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.latencies = deque(maxlen=window or self.WINDOW)
+        self.outcomes = deque(maxlen=window or self.WINDOW)
+        self.counts = {OK: 0, THROTTLED: 0, ERROR: 0}
+        self.cond = asyncio.Condition()
+
+    async def acquire(self):
+        delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        async with self.cond:
+            await self.cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency: float, outcome: str = OK, retry_after: Optional[float] = None):
+        async with self.cond:
+            self.in_flight -= 1
+            self._record(latency, outcome, retry_after)
+            self.cond.notify_all()
+
+    def _record(self, latency: float, outcome: str, retry_after: Optional[float]):
+        now = time.monotonic()
+        self.counts[outcome] += 1
+        self.outcomes.append(outcome != OK)
+        if outcome == OK:
+            self.latencies.append(latency)
+            if self.healthy():
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            return
+
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+        if now - self.last_decrease >= self.DECREASE_INTERVAL:
+            self.last_decrease = now
+            self.limit = max(self.min_limit, self.limit * self.DECREASE_FACTOR)
+            logger.warning(f"Backing off to {int(self.limit)} concurrent requests after {outcome}")
+
+    def healthy(self) -> bool:
+        p95 = self.percentile(95)
+        return (p95 is None or p95 <= self.target_p95) and self.error_rate() <= self.MAX_ERROR_RATE
+
+    def error_rate(self) -> float:
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def snapshot(self) -> dict:
+        percentiles = {f"p{p}": self.percentile(p) for p in (50, 95, 99)}
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 2),
+            **{key: round(value, 3) if value is not None else None for key, value in percentiles.items()},
+            "error_rate": round(self.error_rate(), 3),
+            **self.counts,
+        }
+
+
+class HostThrottle:
+    """One AdaptiveLimiter per host, created on first use with the same settings."""
+
+    def __init__(self, **limiter_options):
+        self.limiter_options = limiter_options
+        self.limiters: dict[str, AdaptiveLimiter] = {}
+
+    def for_host(self, host: str) -> AdaptiveLimiter:
+        if host not in self.limiters:
+            self.limiters[host] = AdaptiveLimiter(**self.limiter_options)
+        return self.limiters[host]
+
+    def snapshot(self) -> dict:
+        return {host: limiter.snapshot() for host, limiter in self.limiters.items()}
@@ -0,0 +1,233 @@
+import os
+from datetime import datetime
+from types import SimpleNamespace
+
+# database.py reads MONGO_URI at import time; nothing in the suite connects to it
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, InvalidOperation
+
+BSON_TYPES = {
+    "string": str,
+    "double": float,
+    "int": int,
+    "bool": bool,
+    "date": datetime,
+    "null": type(None),
+    "object": dict,
+    "array": list,
+}
+
+
+def schema_errors(doc: dict, validator: dict) -> list[str]:
+    """The `$jsonSchema` checks Mongo applies to our flat collections: required fields, bsonType and minimum."""
+    schema = validator["$jsonSchema"]
+    errors = [f"{field} is required" for field in schema.get("required", []) if field not in doc]
+    for field, rules in schema.get("properties", {}).items():
+        if field not in doc or "bsonType" not in rules:
+            continue
+        value = doc[field]
+        types = rules["bsonType"] if isinstance(rules["bsonType"], list) else [rules["bsonType"]]
+        if not any(
+            isinstance(value, BSON_TYPES[name]) and not (name in ("int", "double") and isinstance(value, bool))
+            and not (name == "double" and isinstance(value, int))
+            for name in types
+        ):
+            errors.append(f"{field} must be {types}, got {type(value).__name__}")
+        elif "minimum" in rules and isinstance(value, (int, float)) and value < rules["minimum"]:
+            errors.append(f"{field} must be >= {rules['minimum']}")
+    return errors
+
+
+OPERATORS = {
+    "$in": lambda value, arg: value in arg,
+    "$ne": lambda value, arg: value != arg,
+    "$lt": lambda value, arg: value is not None and value < arg,
+    "$lte": lambda value, arg: value is not None and value <= arg,
+    "$gt": lambda value, arg: value is not None and value > arg,
+    "$gte": lambda value, arg: value is not None and value >= arg,
+}
+
+
+def matches(doc: dict, query: dict) -> bool:
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(doc, branch) for branch in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(key in OPERATORS for key in condition):
+            if not all(OPERATORS[key](doc.get(field), arg) for key, arg in condition.items()):
+                return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+
+def apply_update(doc: dict, update: dict):
+    doc.update(update.get("$set", {}))
+    for field, amount in update.get("$inc", {}).items():
+        doc[field] = doc.get(field, 0) + amount
+
+
+def sort_key(sort: list):
+    def key(doc):
+        # Descending fields compare through _Reversed
+        return tuple(doc.get(field) if direction == 1 else _Reversed(doc.get(field)) for field, direction in sort)
+    return key
+
+
+class _Reversed:
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return self.value > other.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+class FakeCursor:
+    def __init__(self, docs: list[dict]):
+        self.docs = docs
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeCollection:
+    """
+    Just enough of a Motor collection for the write paths and the frontier:
+    `$set` upserts are applied and checked against `validator` and `unique`
+    fields like Mongo does (codes 121 and 11000), other bulk operations are
+    only recorded. Every call is atomic, as there is no await inside.
+    """
+
+    def __init__(self, validator: dict = None, unique: tuple = ()):
+        self.docs: list[dict] = []
+        self.validator = validator
+        self.unique = unique
+        self.bulk_writes: list[list] = []
+
+    def find(self, query: dict = None, projection: dict = None):
+        return FakeCursor([dict(doc) for doc in self.docs if matches(doc, query or {})])
+
+    async def find_one(self, query: dict = None, projection: dict = None):
+        return next((dict(doc) for doc in self.docs if matches(doc, query or {})), None)
+
+    async def insert_many(self, docs: list[dict], ordered: bool = True):
+        write_errors = []
+        for index, doc in enumerate(docs):
+            if any(existing.get(field) == doc.get(field) for field in self.unique for existing in self.docs):
+                write_errors.append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key error"})
+            else:
+                self.docs.append({"_id": ObjectId(), **doc})
+        if write_errors:
+            raise BulkWriteError({"writeErrors": write_errors})
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False):
+        doc = next((doc for doc in self.docs if matches(doc, query)), None)
+        if doc is None and upsert:
+            doc = dict(query)
+            self.docs.append(doc)
+        if doc is not None:
+            apply_update(doc, update)
+
+    async def update_many(self, query: dict, update: dict):
+        for doc in self.docs:
+            if matches(doc, query):
+                apply_update(doc, update)
+
+    async def find_one_and_update(self, query: dict, update: dict, sort: list = None, projection: dict = None, return_document=None):
+        candidates = [doc for doc in self.docs if matches(doc, query)]
+        if sort:
+            candidates.sort(key=sort_key(sort))
+        if not candidates:
+            return None
+        apply_update(candidates[0], update)
+        return dict(candidates[0])
+
+    async def count_documents(self, query: dict, limit: int = 0) -> int:
+        count = sum(1 for doc in self.docs if matches(doc, query))
+        return min(count, limit) if limit else count
+
+    async def delete_many(self, query: dict):
+        before = len(self.docs)
+        self.docs = [doc for doc in self.docs if not matches(doc, query)]
+        return SimpleNamespace(deleted_count=before - len(self.docs))
+
+    async def bulk_write(self, operations: list, ordered: bool = True):
+        if not operations:
+            raise InvalidOperation("No operations to execute")
+        self.bulk_writes.append(operations)
+        write_errors = []
+        for index, operation in enumerate(operations):
+            if set(operation._doc) != {"$set"}:
+                continue
+            existing = next((doc for doc in self.docs if matches(doc, operation._filter)), None)
+            if existing is None and not operation._upsert:
+                continue
+            new = {**(existing or {"_id": ObjectId(), **operation._filter}), **operation._doc["$set"]}
+            errors = schema_errors(new, self.validator) if self.validator else []
+            if errors:
+                write_errors.append({
+                    "index": index, "code": 121, "errmsg": "Document failed validation",
+                    "errInfo": {"details": errors},
+                })
+                continue
+            duplicate = next((
+                field for field in self.unique for doc in self.docs
+                if doc is not existing and doc.get(field) == new.get(field)
+            ), None)
+            if duplicate:
+                write_errors.append({
+                    "index": index, "code": 11000, "errmsg": f"E11000 duplicate key error index: {duplicate}_1",
+                    "keyValue": {duplicate: new[duplicate]},
+                })
+                continue
+            if existing is None:
+                self.docs.append(new)
+            else:
+                existing.update(new)
+        if write_errors:
+            raise BulkWriteError({"writeErrors": write_errors})
+
+
+class FakeDatabase:
+    def __init__(self, collections: dict = None):
+        self.collections = dict(collections or {})
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self.collections:
+            self.collections[name] = FakeCollection()
+        return self.collections[name]
+
+
+@pytest.fixture
+def db():
+    from book.schemas import book_collection_schema
+
+    return FakeDatabase({"book": FakeCollection(book_collection_schema(), unique=("source_url", "content_hash"))})
+
+
+def book_payload(index: int = 0, **fields) -> dict:
+    """A partner-style book: no snapshot path, no description, no HTTP validators."""
+    return {
+        "title": f"Book {index}",
+        "category": "Poetry",
+        "price_incl_tax": 10.0 + index,
+        "price_excl_tax": 10.0 + index,
+        "availability": "In stock (3 available)",
+        "num_reviews": 0,
+        "rating": "Three",
+        "image_url": f"https://example.com/{index}.jpg",
+        "source_url": f"https://example.com/books/{index}",
+        "content_hash": f"hash-{index}",
+        "created_at": "2024-01-01T00:00:00",
+        **fields,
+    }
@@ -0,0 +1,133 @@
+import asyncio
+import os
+from datetime import datetime
+
+import pytest
+
+from book.models import BookSchema
+from book.schemas import book_collection_schema
+from conftest import book_payload, schema_errors
+from services.book_writer import BookBatchWriter, upsert_books
+
+
+async def test_partner_books_pass_the_collection_validator(db):
+    books = [BookSchema(**book_payload(index)) for index in range(3)]
+    assert all(book.raw_html_path is None and book.description is None for book in books)
+
+    results = await upsert_books(db, books)
+
+    assert set(results.values()) == {"inserted"}
+    for doc in db["book"].docs:
+        assert schema_errors(doc, book_collection_schema()) == []
+
+
+async def test_update_writes_a_changelog_entry(db):
+    await upsert_books(db, [BookSchema(**book_payload(1))])
+    results = await upsert_books(db, [BookSchema(**book_payload(1, price_incl_tax=8.5, content_hash="hash-1b"))])
+
+    assert results == {"https://example.com/books/1": "updated"}
+    [changelog] = db["changelog"].docs
+    assert [(change["field"], change["old_value"], change["new_value"]) for change in changelog["changes"]] == [
+        ("price_incl_tax", 11.0, 8.5)
+    ]
+
+
+async def test_errors_carry_the_write_error(db):
+    await upsert_books(db, [BookSchema(**book_payload(1))])
+    errors = {}
+    results = await upsert_books(db, [
+        BookSchema(**book_payload(2, content_hash="hash-1")),
+        BookSchema(**book_payload(3, price_incl_tax=-1)),
+        BookSchema(**book_payload(4)),
+    ], errors)
+
+    assert results == {
+        "https://example.com/books/2": "error",
+        "https://example.com/books/3": "error",
+        "https://example.com/books/4": "inserted",
+    }
+    assert errors["https://example.com/books/2"]["code"] == 11000
+    assert errors["https://example.com/books/3"]["code"] == 121
+    assert [doc["meta"]["source_url"] for doc in db["price_history"].docs] == ["https://example.com/books/1", "https://example.com/books/4"]
+
+
+def url_records(db, urls):
+    db["url_record"].docs.extend({"url": url, "status": False, "lease_until": datetime(2024, 1, 1)} for url in urls)
+    return {doc["url"]: doc for doc in db["url_record"].docs}
+
+
+async def test_periodic_flusher_survives_a_failed_flush(db, monkeypatch):
+    records = url_records(db, ["https://example.com/books/1"])
+    bulk_write = db["book"].bulk_write
+    calls = []
+
+    async def flaky(operations, ordered=True):
+        calls.append(len(operations))
+        if len(calls) == 1:
+            raise RuntimeError("transient")
+        return await bulk_write(operations, ordered)
+
+    monkeypatch.setattr(db["book"], "bulk_write", flaky)
+    writer = BookBatchWriter(db, flush_interval=0.01)
+    await writer.start()
+    await writer.add(BookSchema(**book_payload(1)))
+    for _ in range(100):
+        if len(calls) >= 2:
+            break
+        await asyncio.sleep(0.01)
+    assert len(calls) >= 2
+    assert not writer.flusher.done()
+
+    await writer.close()
+    assert writer.buffer == []
+    assert [doc["source_url"] for doc in db["book"].docs] == ["https://example.com/books/1"]
+    assert records["https://example.com/books/1"]["status"] is True
+
+
+async def test_close_flushes_after_the_flusher_died(db):
+    async def dies():
+        raise RuntimeError("dead")
+
+    writer = BookBatchWriter(db)
+    writer.flusher = asyncio.create_task(dies())
+    await asyncio.sleep(0)
+    await writer.add(BookSchema(**book_payload(1)))
+
+    await writer.close()
+    assert [doc["source_url"] for doc in db["book"].docs] == ["https://example.com/books/1"]
+
+
+async def test_failed_books_are_released_not_marked_done(db):
+    await upsert_books(db, [BookSchema(**book_payload(1))])
+    records = url_records(db, ["https://example.com/books/2", "https://example.com/books/3"])
+
+    writer = BookBatchWriter(db)
+    await writer.add(BookSchema(**book_payload(2, content_hash="hash-1")))
+    await writer.add(BookSchema(**book_payload(3)))
+    await writer.close()
+
+    failed, written = records["https://example.com/books/2"], records["https://example.com/books/3"]
+    assert failed["status"] is False and failed["lease_until"] is None
+    assert written["status"] is True
+
+
+@pytest.mark.skipif(not os.getenv("MONGO_TEST_URI"), reason="set MONGO_TEST_URI to run against a real MongoDB")
+async def test_partner_books_against_mongo():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.environ["MONGO_TEST_URI"])
+    db = client[f"bookscraper_test_{os.getpid()}"]
+    try:
+        await db.create_collection("book", validator=book_collection_schema(), validationLevel="strict")
+        await db["book"].create_index("content_hash", unique=True)
+        await db["book"].create_index("source_url", unique=True)
+
+        errors = {}
+        books = [BookSchema(**book_payload(index, created_at=datetime(2024, 1, 1))) for index in range(3)]
+        results = await upsert_books(db, books, errors)
+
+        assert errors == {}
+        assert set(results.values()) == {"inserted"}
+    finally:
+        await client.drop_database(db.name)
+        client.close()
@@ -0,0 +1,105 @@
+import json
+
+from starlette.requests import Request
+
+from conftest import FakeDatabase
+from services.cache import CacheBackend, LRUCache, ResponseCache, bump_version
+
+
+def request(query: str = "", if_none_match: str = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/api/books",
+        "query_string": query.encode(),
+        "headers": headers,
+    })
+
+
+class Loader:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return {"items": [], "load": self.calls}
+
+
+class DictBackend(CacheBackend):
+    def __init__(self):
+        self.entries = {}
+
+    async def get(self, key):
+        return self.entries.get(key)
+
+    async def set(self, key, body, etag, ttl):
+        self.entries[key] = (body, etag)
+
+
+async def test_hit_after_miss_and_304_on_matching_etag():
+    cache, db, load = ResponseCache(), FakeDatabase(), Loader()
+    first = await cache.respond(request("category=Poetry"), db, load)
+    second = await cache.respond(request("category=Poetry"), db, load)
+
+    assert load.calls == 1
+    assert second.body == first.body and json.loads(first.body) == {"items": [], "load": 1}
+    etag = first.headers["etag"]
+    assert second.headers["etag"] == etag
+
+    revalidated = await cache.respond(request("category=Poetry", if_none_match=etag), db, load)
+    assert revalidated.status_code == 304 and revalidated.body == b""
+    assert revalidated.headers["etag"] == etag
+    assert (await cache.respond(request("category=Poetry", if_none_match='"stale"'), db, load)).status_code == 200
+    assert cache.metrics()["hits"] == 3 and cache.metrics()["misses"] == 1 and cache.metrics()["not_modified"] == 1
+
+
+async def test_query_order_does_not_split_entries():
+    cache, db, load = ResponseCache(), FakeDatabase(), Loader()
+    await cache.respond(request("a=1&b=2"), db, load)
+    await cache.respond(request("b=2&a=1"), db, load)
+    assert load.calls == 1
+
+
+async def test_version_bump_reloads_with_a_new_etag():
+    cache, db, load = ResponseCache(), FakeDatabase(), Loader()
+    before = await cache.respond(request(), db, load)
+
+    await bump_version(db)
+    # Within the check interval the cached version is still trusted
+    assert (await cache.respond(request(), db, load)).headers["etag"] == before.headers["etag"]
+    cache.invalidate()
+    after = await cache.respond(request(), db, load)
+
+    assert load.calls == 2
+    assert after.headers["etag"] != before.headers["etag"]
+    assert (await cache.respond(request(if_none_match=before.headers["etag"]), db, load)).status_code == 200
+    assert cache.metrics()["version"] == 1
+
+
+async def test_shared_backend_serves_other_processes():
+    shared, db = DictBackend(), FakeDatabase()
+    load = Loader()
+    await ResponseCache(shared=shared).respond(request(), db, load)
+    other = ResponseCache(shared=shared)
+    await other.respond(request(), db, load)
+
+    assert load.calls == 1
+    assert other.metrics()["shared_hits"] == 1
+
+
+def test_lru_evicts_the_least_recently_used():
+    lru = LRUCache(max_entries=2)
+    lru.set("a", b"a", "1")
+    lru.set("b", b"b", "2")
+    lru.get("a")
+    lru.set("c", b"c", "3")
+    assert lru.get("b") is None
+    assert lru.get("a") == (b"a", "1")
+
+
+def test_lru_expires_entries():
+    lru = LRUCache(ttl=-1)
+    lru.set("a", b"a", "1")
+    assert lru.get("a") is None
+    assert not lru.entries
@@ -0,0 +1,38 @@
+from bson import ObjectId
+
+from services.changelog import changelog_entry, diff_book
+
+OLD = {
+    "_id": ObjectId("65a000000000000000000001"),
+    "source_url": "https://example.com/books/1",
+    "title": "Book",
+    "price_incl_tax": 10.0,
+    "availability": "In stock (3 available)",
+    "content_hash": "a",
+}
+
+
+def test_diff_book_only_tracked_changed_fields():
+    new = {**OLD, "price_incl_tax": 9.5, "content_hash": "b", "raw_html_path": "x"}
+    assert [(change.field, change.old_value, change.new_value) for change in diff_book(OLD, new)] == [
+        ("price_incl_tax", 10.0, 9.5)
+    ]
+
+
+def test_diff_book_ignores_fields_missing_from_new():
+    assert diff_book(OLD, {"source_url": OLD["source_url"], "title": "Book"}) == []
+
+
+def test_diff_book_reports_added_fields():
+    [change] = diff_book(OLD, {**OLD, "description": "Now with a description"})
+    assert (change.field, change.old_value) == ("description", None)
+
+
+def test_changelog_entry():
+    assert changelog_entry(OLD, dict(OLD)) is None
+
+    entry = changelog_entry(OLD, {**OLD, "title": "Book (2nd edition)", "availability": "Out of stock"})
+    assert entry["book_id"] == "65a000000000000000000001"
+    assert entry["source_url"] == OLD["source_url"]
+    assert [change["field"] for change in entry["changes"]] == ["title", "availability"]
+    assert entry["change_time"] is not None
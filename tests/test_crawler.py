@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+import httpx
+
+from conftest import FakeCollection, FakeDatabase
+from crawler import CrawlerEngine
+from services.frontier import CrawlFrontier
+from services.throttle import THROTTLED
+
+URLS = [CrawlerEngine.CATALOGUE_URL.format(page) for page in (1, 2)]
+
+
+async def test_feed_list_urls_feeds_released_pages_again(tmp_path):
+    engine = CrawlerEngine(output_dir=str(tmp_path))
+    engine.FRONTIER_POLL_INTERVAL = 0.01
+    engine.frontier = CrawlFrontier(FakeDatabase({"url_record": FakeCollection(unique=("url",))}))
+    await engine.frontier.add(URLS, type="list")
+    queue = asyncio.Queue()
+    fed = []
+
+    async def worker():
+        # Fails every page the first time, like a transport error in crawl_page
+        while (url := await queue.get()) is not None:
+            fed.append(url)
+            if fed.count(url) == 1:
+                await engine.frontier.release(url)
+            else:
+                await engine.frontier.complete([url])
+
+    workers = [asyncio.create_task(worker()) for _ in range(engine.LIST_WORKERS)]
+    await asyncio.wait_for(engine.feed_list_urls(queue), timeout=5)
+    await asyncio.gather(*workers)
+
+    assert sorted(fed) == sorted(URLS * 2)
+    assert not await engine.frontier.has_pending("list")
+
+
+class ThrottlingClient:
+    def __init__(self, retry_after: str):
+        self.retry_after = retry_after
+        self.requests = 0
+
+    async def get(self, url, **kwargs):
+        self.requests += 1
+        return httpx.Response(429, headers={"Retry-After": self.retry_after}, request=httpx.Request("GET", url))
+
+
+async def test_retry_after_over_the_cap_gives_up(tmp_path):
+    engine = CrawlerEngine(output_dir=str(tmp_path))
+    client = ThrottlingClient("86400")
+
+    assert await asyncio.wait_for(engine.fetch_response(client, URLS[0]), timeout=5) is None
+    assert client.requests == 1
+    limiter = engine.throttle.for_host("books.toscrape.com")
+    assert limiter.paused_until - time.monotonic() <= engine.MAX_RETRY_AFTER
+    assert limiter.counts[THROTTLED] == 1
@@ -0,0 +1,80 @@
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+import distributed
+from conftest import FakeCollection, FakeDatabase
+from crawler import CrawlerEngine
+from services.book_writer import BookBatchWriter
+from services.coordinator import CrawlCoordinator
+
+BOOK_DETAIL = (Path(__file__).parent / "fixtures" / "book_detail.html").read_text(encoding="utf-8")
+PAGES = 4
+BOOKS_PER_PAGE = 30
+
+
+def catalogue(url: str) -> str:
+    page = url.rsplit("-", 1)[-1].split(".")[0]
+    links = "".join(
+        f'<article class="product_pod"><h3><a href="book-{page}-{index}/index.html">Book</a></h3></article>'
+        for index in range(BOOKS_PER_PAGE)
+    )
+    return f"<html><body>{links}</body></html>"
+
+
+class FakeSite:
+    """Serves every worker's fetches and records how many detail pages one engine fetched at once."""
+
+    def __init__(self):
+        self.in_flight = {}
+        self.peak = 0
+
+    def attach(self, engine: CrawlerEngine):
+        async def fetch(client, url):
+            await asyncio.sleep(0)
+            return catalogue(url)
+
+        async def fetch_response(client, url, headers=None):
+            self.in_flight[engine] = self.in_flight.get(engine, 0) + 1
+            self.peak = max(self.peak, self.in_flight[engine])
+            await asyncio.sleep(0.01)
+            self.in_flight[engine] -= 1
+            # Unique content per page, content_hash is unique in `book`
+            return SimpleNamespace(status_code=200, text=f"{BOOK_DETAIL}<!-- {url} -->", headers={})
+
+        engine.fetch = fetch
+        engine.fetch_response = fetch_response
+
+
+async def test_workers_plan_claim_and_finish_every_shard(tmp_path, monkeypatch):
+    monkeypatch.setattr(distributed, "POLL_INTERVAL", 0.01)
+    db = FakeDatabase({"url_record": FakeCollection(unique=("url",))})
+    coordinator = CrawlCoordinator(db, list_shard_size=2, detail_buckets=2)
+    await coordinator.plan(PAGES)
+
+    site = FakeSite()
+    engines = []
+    for index in range(3):
+        engine = CrawlerEngine(output_dir=str(tmp_path / f"snapshots-{index}"))
+        engine.writer = BookBatchWriter(db, flush_interval=0.02)
+        await engine.writer.start()
+        site.attach(engine)
+        engines.append(engine)
+
+    await asyncio.wait_for(asyncio.gather(*(
+        distributed.work_shards(engine, None, db, coordinator, f"worker-{index}")
+        for index, engine in enumerate(engines)
+    )), timeout=30)
+    for engine in engines:
+        await engine.writer.close()
+
+    shards = db["crawl_shard"].docs
+    assert {shard["status"] for shard in shards} == {"done"}
+    assert sum(shard["processed"] for shard in shards if shard["kind"] == "list") == PAGES
+    assert sum(shard["processed"] for shard in shards if shard["kind"] == "detail") == PAGES * BOOKS_PER_PAGE
+    records = db["url_record"].docs
+    assert len(records) == PAGES + PAGES * BOOKS_PER_PAGE
+    assert all(record["status"] for record in records)
+    assert len(db["book"].docs) == PAGES * BOOKS_PER_PAGE
+    # Detail slots run continuously instead of in lock-step batches of the starting limit
+    assert site.peak > CrawlerEngine.CONCURRENT_REQUESTS
@@ -0,0 +1,93 @@
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from book.models import BookSchema
+from services.extractors import (
+    LxmlExtractor,
+    SoupExtractor,
+    check_parity
+)
+from services.snapshot_archive import SnapshotArchive
+from services.snapshot_store import SnapshotStore
+
+FIXTURES = Path(__file__).parent / "fixtures"
+DETAIL_PAGES = ["book_detail.html", "book_detail_no_description.html"]
+FIXED = {
+    "source_url": "https://books.toscrape.com/catalogue/x/index.html",
+    "content_hash": "x",
+    "crawl_timestamp": datetime(2000, 1, 1),
+    "created_at": datetime(2000, 1, 1),
+}
+
+
+def fixture(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("name", DETAIL_PAGES)
+def test_parse_book_parity(name):
+    html = fixture(name)
+    expected = BookSchema(**SoupExtractor().parse_book(html), **FIXED)
+    actual = BookSchema(**LxmlExtractor().parse_book(html), **FIXED)
+    assert actual == expected
+
+
+def test_parse_book_fields():
+    book = LxmlExtractor().parse_book(fixture("book_detail.html"))
+    assert book["title"] == "A Light in the Attic"
+    assert book["category"] == "Poetry"
+    assert book["price_incl_tax"] == 51.77
+    assert book["availability"] == "In stock (22 available)"
+    assert book["rating"] == "Three"
+    assert book["image_url"] == "https://books.toscrape.com/media/cache/fe/72/fe72f0532301ec28892ae79a629a293c.jpg"
+    assert book["description"].startswith("It's hard to imagine a world without A Light in the Attic.")
+
+
+def test_parse_book_without_description():
+    book = LxmlExtractor().parse_book(fixture("book_detail_no_description.html"))
+    assert book["description"] == ""
+    assert book["price_excl_tax"] == 44.78
+    assert book["num_reviews"] == 12
+
+
+def test_parse_book_links_parity():
+    html = fixture("catalogue.html")
+    links = SoupExtractor().parse_book_links(html)
+    assert LxmlExtractor().parse_book_links(html) == links
+    assert links[:2] == ["a-light-in-the-attic_1000/index.html", "tipping-the-velvet_999/index.html"]
+    assert len(links) == 4
+
+
+@pytest.mark.parametrize("name, pages", [("catalogue.html", 50), ("book_detail.html", None)])
+def test_parse_total_pages_parity(name, pages):
+    html = fixture(name)
+    assert SoupExtractor().parse_total_pages(html) == pages
+    assert LxmlExtractor().parse_total_pages(html) == pages
+
+
+def test_check_parity_counts_candidate_failures(tmp_path, monkeypatch):
+    for name in DETAIL_PAGES:
+        (tmp_path / name).write_text(fixture(name), encoding="utf-8")
+    assert check_parity(str(tmp_path)) == 0
+
+    def broken(self, html):
+        raise IndexError("list index out of range")
+
+    monkeypatch.setattr(LxmlExtractor, "parse_book", broken)
+    assert check_parity(str(tmp_path)) == len(DETAIL_PAGES)
+
+
+async def test_check_parity_reads_store_and_archive(tmp_path, capsys):
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    archive = SnapshotArchive(str(tmp_path / "archive"))
+    for index, name in enumerate(DETAIL_PAGES):
+        await store.put(f"https://example.com/{index}", f"{index:032x}", fixture(name))
+        archive.append(f"https://example.com/{index}", f"{index:032x}", fixture(name))
+    archive.close()
+
+    assert not list((tmp_path / "snapshots").glob("*.html"))
+    for root in ("snapshots", "archive"):
+        assert check_parity(str(tmp_path / root)) == 0
+        assert f"Checked {len(DETAIL_PAGES)} snapshots" in capsys.readouterr().out
@@ -0,0 +1,100 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import FakeCollection, FakeDatabase
+from services.frontier import CrawlFrontier
+
+URLS = [f"https://example.com/catalogue/page-{page}.html" for page in range(1, 21)]
+
+
+@pytest.fixture
+def frontier_db():
+    return FakeDatabase({"url_record": FakeCollection(unique=("url",))})
+
+
+def record(db, url: str) -> dict:
+    return next(doc for doc in db["url_record"].docs if doc["url"] == url)
+
+
+async def test_add_returns_only_new_urls(frontier_db):
+    frontier = CrawlFrontier(frontier_db)
+    assert await frontier.add(URLS[:2]) == URLS[:2]
+    assert await frontier.add(URLS[:3]) == URLS[2:3]
+    assert len(frontier_db["url_record"].docs) == 3
+
+
+async def test_concurrent_leases_never_hand_out_a_url_twice(frontier_db):
+    await CrawlFrontier(frontier_db).add(URLS)
+    workers = [CrawlFrontier(frontier_db, f"worker-{index}") for index in range(4)]
+    leased = await asyncio.gather(*(worker.lease("list", 8) for worker in workers))
+
+    urls = [url for batch in leased for url in batch]
+    assert sorted(urls) == sorted(URLS)
+    assert await workers[0].lease("list", 8) == []
+    for worker, batch in zip(workers, leased):
+        assert {record(frontier_db, url)["leased_by"] for url in batch} <= {worker.worker_id}
+
+
+async def test_expired_lease_is_taken_over(frontier_db):
+    dead = CrawlFrontier(frontier_db, "dead")
+    alive = CrawlFrontier(frontier_db, "alive")
+    await dead.add(URLS[:1])
+    assert await dead.lease("list") == URLS[:1]
+    assert await alive.lease("list") == []
+
+    record(frontier_db, URLS[0])["lease_until"] = datetime.utcnow() - timedelta(seconds=1)
+    assert await alive.lease("list") == URLS[:1]
+    assert record(frontier_db, URLS[0])["leased_by"] == "alive"
+    assert record(frontier_db, URLS[0])["attempts"] == 2
+
+
+async def test_url_is_given_up_after_max_attempts(frontier_db):
+    frontier = CrawlFrontier(frontier_db, max_attempts=3)
+    await frontier.add(URLS[:1])
+    for _ in range(3):
+        assert await frontier.lease("list") == URLS[:1]
+        await frontier.release(URLS[0])
+    assert await frontier.lease("list") == []
+    assert not await frontier.has_pending("list")
+    assert record(frontier_db, URLS[0])["status"] is False
+
+
+async def test_only_the_lease_holder_releases(frontier_db):
+    holder = CrawlFrontier(frontier_db, "holder")
+    other = CrawlFrontier(frontier_db, "other")
+    await holder.add(URLS[:1])
+    await holder.lease("list")
+
+    await other.release(URLS[0])
+    assert record(frontier_db, URLS[0])["lease_until"] is not None
+    assert await other.lease("list") == []
+
+    await holder.release(URLS[0])
+    assert await other.lease("list") == URLS[:1]
+
+
+async def test_has_pending_counts_leased_urls_until_complete(frontier_db):
+    frontier = CrawlFrontier(frontier_db)
+    await frontier.add(URLS[:2], type="list")
+    await frontier.add(URLS[2:3], type="detail")
+    leased = await frontier.lease("list", 2)
+
+    # Leased but not completed: a restarted run resumes instead of starting over
+    assert await frontier.has_pending("list")
+    assert await frontier.pending() == 3
+    await frontier.complete(leased)
+    assert not await frontier.has_pending("list")
+    assert await frontier.has_pending()
+
+
+async def test_reset_starts_a_new_cycle(frontier_db):
+    frontier = CrawlFrontier(frontier_db)
+    await frontier.add(URLS[:2])
+    await frontier.complete(URLS[:1])
+    await frontier.reset()
+
+    assert not await frontier.has_pending()
+    assert await frontier.add(URLS[:2]) == URLS[:2]
+    assert await frontier.lease("list", 2) == URLS[:2]
@@ -0,0 +1,106 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from book.ingest import ingest_books, validate_chunk
+from book.routers import router
+from conftest import book_payload
+from database import get_database
+from services.rate_limiter import rate_limit
+
+
+class FakeRequest:
+    def __init__(self, body: bytes, content_type: str = "application/json", chunk_size: int = 64):
+        self.body_bytes = body
+        self.headers = {"content-type": content_type}
+        self.chunk_size = chunk_size
+
+    async def body(self) -> bytes:
+        return self.body_bytes
+
+    async def stream(self):
+        for start in range(0, len(self.body_bytes), self.chunk_size):
+            yield self.body_bytes[start:start + self.chunk_size]
+
+
+def ndjson(*items) -> bytes:
+    return b"\n".join(item if isinstance(item, bytes) else json.dumps(item).encode() for item in items)
+
+
+def test_validate_chunk_keeps_errors_per_item():
+    books, failed = validate_chunk([book_payload(0), {"title": "no price"}, book_payload(2), "not an object"])
+
+    assert [book.source_url for book in books] == ["https://example.com/books/0", "https://example.com/books/2"]
+    assert set(failed) == {1, 3}
+    assert {error["loc"][0] for error in failed[1]} >= {"price_incl_tax", "source_url"}
+
+
+async def test_ingest_json_array(db):
+    body = json.dumps([book_payload(0), book_payload(1), {"title": "x"}]).encode()
+    response = await ingest_books(db, FakeRequest(body), chunk_size=2)
+
+    assert response["summary"] == {"inserted": 2, "updated": 0, "invalid": 1, "error": 0}
+    assert [result["index"] for result in response["results"]] == [0, 1, 2]
+    assert db["cache_version"].docs[0]["version"] == 1
+
+
+async def test_malformed_ndjson_line_is_reported_not_fatal(db):
+    body = ndjson(book_payload(0), book_payload(1), b'{"title": "cut off', book_payload(3))
+    response = await ingest_books(db, FakeRequest(body, "application/x-ndjson"), chunk_size=2)
+
+    assert response["summary"] == {"inserted": 3, "updated": 0, "invalid": 1, "error": 0}
+    malformed = response["results"][2]
+    assert malformed["status"] == "invalid" and malformed["errors"][0]["type"] == "json_invalid"
+    assert len(db["book"].docs) == 3
+    assert db["cache_version"].docs[0]["version"] == 1
+
+
+async def test_cache_version_bumped_when_a_later_chunk_fails(db):
+    bulk_write = db["book"].bulk_write
+    calls = []
+
+    async def fail_second_chunk(operations, ordered=True):
+        calls.append(operations)
+        if len(calls) > 1:
+            raise RuntimeError("primary stepped down")
+        await bulk_write(operations, ordered)
+
+    db["book"].bulk_write = fail_second_chunk
+    body = ndjson(book_payload(0), book_payload(1), book_payload(2))
+    with pytest.raises(RuntimeError):
+        await ingest_books(db, FakeRequest(body, "application/x-ndjson"), chunk_size=2)
+    assert len(db["book"].docs) == 2
+    assert db["cache_version"].docs[0]["version"] == 1
+
+
+async def test_write_errors_are_reported_per_item(db):
+    body = json.dumps([book_payload(0), book_payload(1, content_hash="hash-0")]).encode()
+    response = await ingest_books(db, FakeRequest(body))
+
+    error = response["results"][1]
+    assert error["status"] == "error" and error["errors"][0]["code"] == 11000
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    app.dependency_overrides[get_database] = lambda: db
+    app.dependency_overrides[rate_limit] = lambda: None
+    return TestClient(app)
+
+
+def test_create_book_status_codes(client):
+    assert client.post("/api/books", json=book_payload(0)).json()["status"] == "inserted"
+    assert client.post("/api/books", json=book_payload(0, title="Renamed")).json()["status"] == "updated"
+
+    duplicate = client.post("/api/books", json=book_payload(1, content_hash="hash-0"))
+    assert duplicate.status_code == 409
+    assert duplicate.json()["detail"]["code"] == 11000
+
+    invalid = client.post("/api/books", json=book_payload(2, price_incl_tax=-1))
+    assert invalid.status_code == 422
+    assert invalid.json()["detail"]["code"] == 121
+    assert "price_incl_tax must be >= 0" in invalid.json()["detail"]["details"]["details"]
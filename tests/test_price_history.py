@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from conftest import FakeDatabase
+from services.price_history import day_of, record_observations, stock_of
+
+OBSERVED_AT = datetime(2024, 5, 1, 13, 45)
+
+
+def test_stock_of():
+    assert stock_of("In stock (22 available)") == (True, 22)
+    assert stock_of("In stock") == (True, None)
+    assert stock_of("Out of stock") == (False, None)
+    assert stock_of(None) == (False, None)
+
+
+def test_day_of():
+    assert day_of(OBSERVED_AT) == datetime(2024, 5, 1)
+
+
+async def test_record_observations_rolls_up_per_book_and_category():
+    db = FakeDatabase()
+    await record_observations(db, [
+        {"source_url": "a", "category": "Poetry", "price_incl_tax": 10.0, "price_excl_tax": 10.0, "availability": "In stock (2 available)"},
+        {"source_url": "b", "category": "Poetry", "price_incl_tax": 12.0, "price_excl_tax": 12.0, "availability": "Out of stock"},
+        {"source_url": "c", "category": "Poetry", "price_incl_tax": None},
+    ], OBSERVED_AT)
+
+    assert [doc["stock"] for doc in db["price_history"].docs] == [2, None]
+    [book_ops] = db["price_daily"].bulk_writes
+    assert [op._filter for op in book_ops] == [{"source_url": "a", "day": datetime(2024, 5, 1)}, {"source_url": "b", "day": datetime(2024, 5, 1)}]
+    [category_ops] = db["category_daily"].bulk_writes
+    assert [op._doc["$inc"]["in_stock_samples"] for op in category_ops] == [1, 0]
+
+
+async def test_record_observations_without_categories():
+    db = FakeDatabase()
+    await record_observations(db, [
+        {"source_url": "a", "category": "", "price_incl_tax": 10.0, "price_excl_tax": 10.0, "availability": "In stock"},
+    ], OBSERVED_AT)
+
+    assert len(db["price_daily"].bulk_writes) == 1
+    assert db["category_daily"].bulk_writes == []
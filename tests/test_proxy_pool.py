@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import pytest
+
+from services.proxy_pool import BLOCKED, ProxyPool
+from services.throttle import ERROR, OK
+
+PROXIES = ["http://10.0.0.1:8080", "http://10.0.0.2:8080"]
+
+
+async def test_no_proxies_means_no_lease():
+    assert await ProxyPool([]).acquire() is None
+
+
+async def test_spreads_load_and_caps_in_flight():
+    pool = ProxyPool(PROXIES, max_in_flight=2)
+    leases = [await pool.acquire() for _ in range(4)]
+    assert sorted(lease.proxy for lease in leases) == sorted(PROXIES * 2)
+
+    waiter = asyncio.create_task(pool.acquire())
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+
+    await pool.release(leases[0])
+    lease = await asyncio.wait_for(waiter, 1)
+    assert lease.proxy == leases[0].proxy
+
+
+async def test_prefers_the_healthier_proxy():
+    pool = ProxyPool(PROXIES)
+    unhealthy, healthy = pool.states
+    unhealthy.counts[ERROR] = 5
+    for _ in range(3):
+        assert (await pool.acquire()).state is healthy
+    # Once the better proxy is at capacity the other one still gets work
+    healthy.in_flight = pool.max_in_flight
+    assert (await pool.acquire()).state is unhealthy
+
+
+async def test_block_cooldown_doubles_and_is_not_escalated_by_in_flight_blocks():
+    pool = ProxyPool(PROXIES[:1], max_in_flight=3, block_cooldown=60)
+    state = pool.states[0]
+    first, second = await pool.acquire(), await pool.acquire()
+
+    await pool.release(first, BLOCKED)
+    assert 59 < state.cooling_for(time.monotonic()) <= 60
+    cooling_until = state.cooldown_until
+    # Sent before the cooldown started: counted, but it does not extend the cooldown
+    await pool.release(second, BLOCKED)
+    assert (state.cooldown_until, state.consecutive_blocks, state.counts[BLOCKED]) == (cooling_until, 1, 2)
+
+    assert await pool.acquire() is None  # the only proxy is cooling down
+
+    state.cooldown_until = 0  # cooldown over
+    await pool.release(await pool.acquire(), BLOCKED)
+    assert 119 < state.cooling_for(time.monotonic()) <= 120
+
+
+async def test_repeated_errors_cool_briefly():
+    pool = ProxyPool(PROXIES[:1])
+    state = pool.states[0]
+    for _ in range(ProxyPool.MAX_CONSECUTIVE_ERRORS - 1):
+        await pool.release(await pool.acquire(), ERROR)
+    assert state.cooldown_until == 0
+    await pool.release(await pool.acquire(), ERROR)
+    assert state.cooldown_until > 0
+
+
+async def test_lease_context_manager():
+    pool = ProxyPool(PROXIES[:1])
+    async with pool.lease() as lease:
+        assert pool.state()["in_flight"] == 1
+    assert pool.states[0].counts[OK] == 1
+
+    with pytest.raises(RuntimeError):
+        async with pool.lease():
+            raise RuntimeError("connection reset")
+    assert pool.states[0].counts[ERROR] == 1
+
+    async with pool.lease() as lease:
+        lease.outcome = None  # unused lease: nothing recorded
+    assert sum(pool.states[0].counts.values()) == 2
+    assert pool.state()["in_flight"] == 0
@@ -0,0 +1,61 @@
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from config import settings
+from services.rate_limiter import MemoryBackend, RateLimiter, rate_limit, rate_limiter
+
+
+async def test_burst_then_steady_rate():
+    limiter = RateLimiter(limit=10, window=100, burst=3)  # one request per 10s, 3 back to back
+
+    decisions = [await limiter.hit("key", now=0) for _ in range(4)]
+    assert [decision.allowed for decision in decisions] == [True, True, True, False]
+    assert [decision.remaining for decision in decisions[:3]] == [2, 1, 0]
+    assert decisions[3].retry_after == 10
+
+    assert not (await limiter.hit("key", now=9.9)).allowed
+    assert (await limiter.hit("key", now=10)).allowed
+    # A denied request does not push the schedule back
+    assert (await limiter.hit("key", now=20)).allowed
+
+
+async def test_keys_are_independent():
+    limiter = RateLimiter(limit=1, window=60, burst=1)
+    assert (await limiter.hit("a", now=0)).allowed
+    assert not (await limiter.hit("a", now=1)).allowed
+    assert (await limiter.hit("b", now=1)).allowed
+
+
+async def test_idle_key_recovers_full_burst():
+    limiter = RateLimiter(limit=10, window=100, burst=3)
+    for _ in range(3):
+        await limiter.hit("key", now=0)
+    assert (await limiter.hit("key", now=1000)).remaining == 2
+
+
+async def test_memory_backend_evicts_least_recent_keys():
+    backend = MemoryBackend(max_keys=2)
+    limiter = RateLimiter(limit=1, window=60, burst=1, backend=backend)
+    for key in ("a", "b", "c"):
+        await limiter.hit(key, now=0)
+    assert list(backend.tats) == ["b", "c"]
+
+
+def test_rate_limit_dependency_headers(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "backend", MemoryBackend())
+    app = FastAPI()
+
+    @app.get("/limited", dependencies=[Depends(rate_limit)])
+    async def limited():
+        return {}
+
+    client = TestClient(app)
+    headers = {"X-API-Key": settings.API_KEY}
+    assert client.get("/limited").status_code == 422
+    assert client.get("/limited", headers={"X-API-Key": "wrong"}).status_code == 401
+
+    responses = [client.get("/limited", headers=headers) for _ in range(settings.RATE_LIMIT_BURST + 1)]
+    assert [response.status_code for response in responses[:-1]] == [200] * settings.RATE_LIMIT_BURST
+    assert responses[0].headers["X-RateLimit-Limit"] == str(settings.RATE_LIMIT)
+    assert responses[-1].status_code == 429
+    assert int(responses[-1].headers["Retry-After"]) > 0
@@ -0,0 +1,67 @@
+import asyncio
+
+from services.scheduler import SlidingWindowScheduler
+
+
+async def test_results_come_back_with_their_items():
+    scheduler = SlidingWindowScheduler(3)
+    results = {}
+
+    async def handler(item):
+        await asyncio.sleep(0.001 * (item % 4))
+        return item * 2
+
+    await scheduler.run(range(20), handler, lambda item, result: results.__setitem__(item, result))
+
+    assert results == {item: item * 2 for item in range(20)}
+    assert scheduler.metrics()["completed"] == 20
+
+
+async def test_never_more_than_slots_in_flight():
+    scheduler = SlidingWindowScheduler(4)
+    in_flight, peak = 0, 0
+
+    async def handler(item):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0)
+        in_flight -= 1
+
+    await scheduler.run(range(50), handler)
+    assert peak == 4
+
+
+async def test_slow_item_only_holds_its_own_slot():
+    scheduler = SlidingWindowScheduler(2)
+    finished = []
+
+    async def handler(item):
+        await asyncio.sleep(0.2 if item == 0 else 0.01)
+        finished.append(item)
+
+    await scheduler.run(range(11), handler)
+
+    # In lock-step batches of 2, items 2..10 would all wait for item 0
+    assert finished[-1] == 0
+    assert sorted(finished) == list(range(11))
+
+
+async def test_failures_are_counted_and_the_slot_moves_on():
+    scheduler = SlidingWindowScheduler(2)
+    seen = []
+
+    async def handler(item):
+        if item % 3 == 0:
+            raise ValueError(item)
+        return item
+
+    async def on_result(item, result):
+        seen.append(result)
+
+    await scheduler.run(range(9), handler, on_result)
+
+    assert sorted(seen) == [1, 2, 4, 5, 7, 8]
+    metrics = scheduler.metrics()
+    assert (metrics["completed"], metrics["errors"]) == (6, 3)
+    assert len(metrics["slot_utilization"]) == 2
@@ -0,0 +1,73 @@
+import hashlib
+import multiprocessing
+
+from services.snapshot_archive import SnapshotArchive
+
+PAGES = [f"<html><body>page {index} {'x' * (index * 37 % 500)}</body></html>" for index in range(60)]
+
+
+def content_hash(html: str) -> str:
+    return hashlib.md5(html.encode("utf-8")).hexdigest()
+
+
+def append_all(root: str, worker: int):
+    archive = SnapshotArchive(root, compression="gzip", segment_size=4096)
+    # Every worker writes every page, starting at a different one, so the same hashes race
+    for html in PAGES[worker:] + PAGES[:worker]:
+        archive.append(f"https://example.com/{content_hash(html)}", content_hash(html), html)
+    archive.close()
+
+
+def test_append_and_read(tmp_path):
+    archive = SnapshotArchive(str(tmp_path), compression="gzip")
+    ref = archive.append("https://example.com/a", content_hash(PAGES[0]), PAGES[0])
+    assert ref == f"pack:{content_hash(PAGES[0])}"
+    assert archive.append("https://example.com/a", content_hash(PAGES[0]), PAGES[0]) == ref
+    assert archive.stats["writes"] == 1 and archive.stats["skipped"] == 1
+    assert archive.get(content_hash(PAGES[0])) == PAGES[0]
+    assert archive.get_by_url("https://example.com/a") == PAGES[0]
+    archive.close()
+
+
+def test_concurrent_processes_share_one_archive(tmp_path):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=append_all, args=(str(tmp_path), worker)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    archive = SnapshotArchive(str(tmp_path))
+    records = list(archive.iter_records())
+    # Each page stored exactly once, every record intact and matching its index entry
+    assert sorted(entry["content_hash"] for entry, _ in records) == sorted(map(content_hash, PAGES))
+    for entry, html in records:
+        assert content_hash(html) == entry["content_hash"]
+        assert archive.get(entry["content_hash"]) == html
+    assert len(archive.by_hash) == len(PAGES)
+    archive.close()
+
+
+def test_reader_sees_appends_from_another_instance(tmp_path):
+    reader = SnapshotArchive(str(tmp_path))
+    writer = SnapshotArchive(str(tmp_path))
+    writer.append("https://example.com/b", content_hash(PAGES[1]), PAGES[1])
+    assert reader.get(content_hash(PAGES[1])) == PAGES[1]
+    # The reader now knows the hash, so appending it again is skipped
+    reader.append("https://example.com/b", content_hash(PAGES[1]), PAGES[1])
+    assert reader.stats["skipped"] == 1
+    reader.close()
+    writer.close()
+
+
+def test_reader_remaps_a_segment_another_instance_grew(tmp_path):
+    reader = SnapshotArchive(str(tmp_path))
+    reader.append("https://example.com/a", content_hash(PAGES[0]), PAGES[0])
+    assert reader.get(content_hash(PAGES[0])) == PAGES[0]
+    writer = SnapshotArchive(str(tmp_path))
+    writer.append("https://example.com/b", content_hash(PAGES[1]), PAGES[1])
+    # Same segment, but the reader's mapping ends before the new record
+    assert reader.get(content_hash(PAGES[1])) == PAGES[1]
+    reader.close()
+    writer.close()
@@ -0,0 +1,32 @@
+import asyncio
+import json
+
+from services.snapshot_store import SnapshotStore
+
+HTML = "<html><body>page</body></html>"
+HASH = "ab" * 16
+
+
+def index_lines(store: SnapshotStore) -> list[dict]:
+    return [json.loads(line) for line in store.index_path.read_text(encoding="utf-8").splitlines()]
+
+
+async def test_concurrent_puts_of_one_hash(tmp_path):
+    store = SnapshotStore(str(tmp_path), compression="gzip")
+    paths = await asyncio.gather(*(store.put(f"https://example.com/{index}", HASH, HTML) for index in range(8)))
+
+    assert set(paths) == {str(store.path_for(HASH))}
+    assert len(index_lines(store)) == 1
+    assert store.stats["writes"] == 1 and store.stats["skipped"] == 7
+    assert [path.name for path in store.objects.rglob("*") if path.is_file()] == [f"{HASH}.html.gz"]
+    assert await store.get(HASH) == HTML
+
+
+async def test_stores_sharing_a_root_write_the_index_once(tmp_path):
+    # Two instances stand in for two processes: no shared in-flight map, only the filesystem
+    stores = [SnapshotStore(str(tmp_path), compression="gzip") for _ in range(2)]
+    await asyncio.gather(*(store.put("https://example.com/a", HASH, HTML) for store in stores for _ in range(4)))
+
+    assert len(index_lines(stores[0])) == 1
+    assert sum(store.stats["writes"] for store in stores) == 1
+    assert not list(stores[0].objects.rglob("*.tmp"))
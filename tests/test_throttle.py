@@ -0,0 +1,83 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from services.throttle import ERROR, OK, THROTTLED, AdaptiveLimiter, HostThrottle, parse_retry_after
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("30") == 30.0
+    assert parse_retry_after("-5") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    in_a_minute = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=60), usegmt=True)
+    assert 55 <= parse_retry_after(in_a_minute) <= 60
+
+
+async def test_healthy_responses_grow_the_limit_additively():
+    limiter = AdaptiveLimiter(initial=4, max_limit=6)
+    for _ in range(4):
+        await limiter.acquire()
+        await limiter.release(0.1, OK)
+    # +1/limit per response: about +1 per round of `limit` requests
+    assert 4.9 < limiter.limit < 5.0
+
+    for _ in range(100):
+        await limiter.acquire()
+        await limiter.release(0.1, OK)
+    assert limiter.limit == 6
+
+
+async def test_slow_responses_stop_the_growth():
+    limiter = AdaptiveLimiter(initial=4, target_p95=0.5)
+    for _ in range(10):
+        await limiter.acquire()
+        await limiter.release(1.0, OK)
+    assert limiter.limit == 4
+
+
+async def test_failures_halve_the_limit_once_per_interval():
+    limiter = AdaptiveLimiter(initial=16)
+    for _ in range(5):
+        await limiter.acquire()
+        await limiter.release(0.1, ERROR)
+    assert limiter.limit == 8
+
+    limiter.last_decrease -= AdaptiveLimiter.DECREASE_INTERVAL
+    await limiter.acquire()
+    await limiter.release(0.1, THROTTLED)
+    assert limiter.limit == 4
+    assert limiter.counts == {OK: 0, THROTTLED: 1, ERROR: 5}
+
+
+async def test_retry_after_pauses_the_host():
+    limiter = AdaptiveLimiter(initial=4)
+    await limiter.acquire()
+    await limiter.release(0.1, THROTTLED, retry_after=0.2)
+    assert limiter.snapshot()["paused_for"] > 0.1
+
+    started = time.monotonic()
+    await limiter.acquire()
+    assert time.monotonic() - started >= 0.15
+    await limiter.release(0.1, OK)
+
+
+async def test_limit_caps_requests_in_flight():
+    limiter = AdaptiveLimiter(initial=2)
+    await limiter.acquire()
+    await limiter.acquire()
+    waiting = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0.01)
+    assert not waiting.done()
+
+    await limiter.release(0.1, OK)
+    await asyncio.wait_for(waiting, timeout=1)
+    assert limiter.in_flight == 2
+
+
+def test_host_throttle_keeps_one_limiter_per_host():
+    throttle = HostThrottle(initial=3)
+    assert throttle.for_host("a") is throttle.for_host("a")
+    assert throttle.for_host("b") is not throttle.for_host("a")
+    assert throttle.snapshot()["a"]["limit"] == 3